@@ -0,0 +1,58 @@
+"""Solves batches of boards across a pool of worker processes
+"""
+import os
+import tempfile
+from multiprocessing import Pool
+
+from tries import Trie
+
+_dictionary = None      # trie loaded once per worker process by _init_worker
+
+
+def _init_worker(file_name):
+    """Pool initializer: maps the saved dictionary into the worker process
+
+    :param file_name: file written by Trie.save
+    :type file_name: str
+    """
+    global _dictionary
+    _dictionary = Trie.load(file_name)
+
+
+def _solve(task):
+    """Solves one (index, matrix) task in a worker, returns (index, words found)
+    """
+    index, matrix = task
+    return index, _dictionary.word_hunt(matrix)
+
+
+def solve_boards(boards, dictionary, workers=None, chunksize=1, ordered=True):
+    """Generator that runs word_hunt on every board using a pool of processes
+
+    Workers map the dictionary from a file written by Trie.save once at startup, so only the
+    boards and their results are sent between processes
+
+    :param boards: iterable of matrices to search through
+    :type boards: iterable
+    :param dictionary: trie to search with, or name of a file written by Trie.save
+    :type dictionary: Trie or str
+    :param workers: number of worker processes, defaults to os.cpu_count()
+    :type workers: int, optional
+    :param chunksize: number of boards sent to a worker at a time, defaults to 1
+    :type chunksize: int, optional
+    :param ordered: yield results in input order, otherwise as they complete, defaults to True
+    :type ordered: bool, optional
+    :return: generator of (index of board in boards, list of words found)
+    :rtype: generator
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        if isinstance(dictionary, str):
+            file_name = dictionary
+        else:
+            file_name = os.path.join(directory, 'dictionary.trie')
+            dictionary.save(file_name)
+
+        with Pool(workers, initializer=_init_worker, initargs=(file_name,)) as pool:
+            solve = pool.imap if ordered else pool.imap_unordered
+            for result in solve(_solve, enumerate(boards), chunksize):
+                yield result
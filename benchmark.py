@@ -0,0 +1,647 @@
+"""Benchmarks for the trie data structures
+
+Run as a script: python benchmark.py [name ...]; see python benchmark.py --help
+
+The suite benchmark times every core Trie operation across dictionary and board sizes and writes
+JSON, so runs from two commits can be compared with --compare
+"""
+import argparse
+import asyncio
+import fnmatch
+import gc
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from batch import solve_boards
+from optimize import IncrementalSolver, anneal, build_gaddag, letter_weights
+from service import SolverService
+from tries import Trie, CompactTrie, ConcurrentTrie, BoardIndex, SuffixIndex
+
+LETTERS = 'eeeeeeeeeeeeaaaaaaaaaiiiiiiiiioooooooonnnnnnrrrrrrttttttllllssssuuuuddddgggbbccmmppffhhvvwwyykjxqz'
+
+
+def generate_words(count, seed=0):
+    """Returns a sorted list of count distinct pseudo-words; used instead of shipping a word list
+
+    :param count: number of words to generate
+    :type count: int
+    :param seed: random seed, defaults to 0
+    :type seed: int, optional
+    :rtype: list
+    """
+    rand = random.Random(seed)
+    words = set()
+    while len(words) < count:
+        length = min(max(int(rand.gauss(8, 2.5)), 2), 20)
+        words.add(''.join(rand.choice(LETTERS) for _ in range(length)))
+    return sorted(words)
+
+
+def generate_board(size, seed=0):
+    """Returns a size x size matrix of random letters
+
+    :param size: number of rows and columns
+    :type size: int
+    :param seed: random seed, defaults to 0
+    :type seed: int, optional
+    :rtype: nested list
+    """
+    rand = random.Random(seed)
+    return [[rand.choice(LETTERS) for _ in range(size)] for _ in range(size)]
+
+
+def timed(function, *args):
+    """Calls function, returns (result, seconds taken)
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def allocated(function, *args):
+    """Calls function under tracemalloc, returns (result, bytes still allocated, peak bytes allocated)
+    """
+    tracemalloc.start()
+    result = function(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak
+
+
+def build_trie(words):
+    """Returns Trie holding words
+    """
+    trie = Trie()
+    for word in words:
+        trie.insert_word(word)
+    return trie
+
+
+def bench_build(count=300000, total=1500000, workers=(2, 4)):
+    """Compares convert_from_text in one process against building in parallel, on a text file of
+    total words drawn from count distinct ones
+    """
+    words = generate_words(count)
+    rand = random.Random(0)
+
+    def library(trie):
+        return [(word, trie.search_prefix(word)._count) for word in trie.iter_library(sort=True)]
+
+    def paused(trie, file_name):
+        gc.disable()
+        try:
+            return trie.convert_from_text(file_name)
+        finally:
+            gc.enable()
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, 'words.txt')
+        with open(file_name, 'w') as writer:
+            writer.write(' '.join(rand.choice(words) for _ in range(total)))
+
+        print('%d words read, %d distinct, %d cpus' % (total, count, os.cpu_count()))
+        sequential = Trie()
+        seconds = timed(sequential.convert_from_text, file_name)[1]
+        expected = library(sequential)
+        print('%-28s %8.2f s' % ('convert_from_text', seconds))
+        print('%-28s %8.2f s' % ('  with gc paused', timed(paused, Trie(), file_name)[1]))
+        for count in workers:
+            parallel = Trie()
+            seconds = timed(parallel.convert_from_text, file_name, 1 << 20, 100000, None, count)[1]
+            assert library(parallel) == expected and parallel.size == sequential.size
+            print('%-28s %8.2f s' % ('convert_from_text, %d workers' % count, seconds))
+
+
+def bench_nodes(count=100000, queries=100000):
+    """Measures bytes per TrieNode and lookups per second through get_child and search_word
+    """
+    words = generate_words(count)
+    trie, size = allocated(build_trie, words)[:2]
+    nodes = []
+    stack = [trie.root]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(node._children.values())
+    leaves = sum(1 for node in nodes if node.is_leaf())
+
+    rand = random.Random(0)
+    present = rand.sample(words, queries // 2)
+    absent = [word[:-1] + '!' for word in rand.sample(words, queries - queries // 2)]
+    edges = [(node, val) for node in rand.sample(nodes, min(queries, len(nodes))) for val in node._children][:queries]
+
+    print('%d words, %d nodes, %d leaves' % (count, len(nodes), leaves))
+    print('bytes per node: %.1f' % (size / len(nodes)))
+    searched = timed(lambda: [trie.search_word(word) for word in present + absent])[1]
+    print('search_word/s: %.0f' % (queries / searched))
+    followed = timed(lambda: [node.get_child(val) for node, val in edges])[1]
+    print('get_child/s:   %.0f' % (len(edges) / followed))
+
+
+def bench_compact(count=100000):
+    """Compares memory, build time and lookups of Trie against CompactTrie
+    """
+    words = generate_words(count)
+    trie, trie_seconds = timed(build_trie, words)
+    compact, compact_seconds = timed(CompactTrie.from_trie, trie)
+    trie_bytes = allocated(build_trie, words)[1]
+    compact_bytes, compact_peak = allocated(CompactTrie.from_trie, trie)[1:]
+
+    print('%d words' % count)
+    print('%-12s %12s %10s %10s' % ('', 'bytes', 'build s', 'search/s'))
+    for name, structure, seconds, size in (('Trie', trie, trie_seconds, trie_bytes),
+                                           ('CompactTrie', compact, compact_seconds, compact_bytes)):
+        seconds_searching = timed(lambda: [structure.search_word(word) for word in words])[1]
+        print('%-12s %12d %10.3f %10.0f' % (name, size, seconds, len(words) / seconds_searching))
+    print('CompactTrie nodes: %d, peak bytes while compacting: %d' % (compact.node_count(), compact_peak))
+
+
+def bench_load(count=100000):
+    """Compares building a trie with convert_from_text against mapping a saved one with Trie.load
+    """
+    words = generate_words(count)
+    with tempfile.TemporaryDirectory() as directory:
+        text_name = os.path.join(directory, 'words.txt')
+        trie_name = os.path.join(directory, 'words.trie')
+        with open(text_name, 'w') as writer:
+            writer.write('\n'.join(words))
+
+        convert_seconds = timed(lambda: Trie().convert_from_text(text_name))[1]
+        build_trie(words).save(trie_name)
+        loaded, load_seconds = timed(Trie.load, trie_name)
+
+        print('%d words, %d byte file' % (count, os.path.getsize(trie_name)))
+        print('convert_from_text: %.3f s' % convert_seconds)
+        print('Trie.load:         %.6f s' % load_seconds)
+        del loaded
+
+
+def bench_batch(count=100000, boards=400, size=5, workers=None):
+    """Compares boards/sec of solve_boards against a sequential loop of Trie.word_hunt
+    """
+    trie = build_trie(generate_words(count))
+    matrices = [generate_board(size, seed) for seed in range(boards)]
+
+    sequential_seconds = timed(lambda: [trie.word_hunt(matrix) for matrix in matrices])[1]
+    batch_seconds = timed(lambda: list(solve_boards(matrices, trie, workers, chunksize=8)))[1]
+
+    print('%d %dx%d boards, %d words, %d workers' % (boards, size, size, count, workers or os.cpu_count()))
+    print('sequential word_hunt: %8.1f boards/s' % (boards / sequential_seconds))
+    print('solve_boards:         %8.1f boards/s' % (boards / batch_seconds))
+
+
+def bench_prune(count=100000, boards=30, sizes=(4, 5), repeat=5):
+    """Compares word_hunt against ruling words out with a BoardIndex, best of repeat runs; the
+    index's candidates alone cost a large share of a whole search
+    """
+    trie = build_trie(generate_words(count))
+    index, index_seconds = timed(BoardIndex, trie)
+    print('%d words, BoardIndex built in %.3f s' % (count, index_seconds))
+    for size in sizes:
+        matrices = [generate_board(size, seed) for seed in range(boards)]
+        plain = min(timed(lambda: [trie.word_hunt(matrix) for matrix in matrices])[1] for _ in range(repeat))
+        candidates = min(timed(lambda: [index.candidates(matrix) for matrix in matrices])[1] for _ in range(repeat))
+        pruned = min(timed(lambda: [index.prune(matrix).word_hunt(matrix) for matrix in matrices])[1] for _ in range(repeat))
+        print('%dx%d: word_hunt %6.2f ms/board, candidates %6.2f ms/board, prune and search %6.2f ms/board'
+              % (size, size, 1000 * plain / boards, 1000 * candidates / boards, 1000 * pruned / boards))
+
+
+def bench_autocomplete(count=100000, k=10, repeat=100):
+    """Compares autocomplete against ranking every completion from get_library
+    """
+    rand = random.Random(0)
+    trie = Trie()
+    for word in generate_words(count):
+        for _ in range(int(rand.paretovariate(1))):
+            trie.insert_word(word)
+
+    print('%d words, k = %d' % (count, k))
+    for prefix in ('', 's', 'st', 'ste'):
+        def ranked():
+            node = trie.search_prefix(prefix)
+            library = trie.get_library(node, library = [])
+            return sorted(library, key=lambda word: -trie.search_prefix(prefix + word)._count)[:k]
+        full = timed(ranked)[1]
+        best = timed(lambda: [trie.autocomplete(prefix, k) for _ in range(repeat)])[1] / repeat
+        print('prefix %-5r get_library + sort %9.3f ms, autocomplete %7.3f ms' % (prefix, 1000 * full, 1000 * best))
+
+
+def bench_concurrent(count=100000, readers=4, seconds=2.0):
+    """Measures ConcurrentTrie read throughput with and without a thread writing at the same time
+    """
+    words = generate_words(count)
+    updates = generate_words(1000, seed=1)
+    trie = ConcurrentTrie(build_trie(words))
+
+    def run(writing):
+        stop = threading.Event()
+        reads = [0] * readers
+        writes = [0]
+
+        def read(n):
+            rand = random.Random(n)
+            while not stop.is_set():
+                for word in rand.sample(words, 100):
+                    trie.search_word(word)
+                reads[n] += 100
+
+        def write():
+            while not stop.is_set():
+                word = updates[writes[0] % len(updates)]
+                trie.insert_word(word)
+                trie.remove_word(word)
+                writes[0] += 2
+
+        threads = [threading.Thread(target=read, args=(n,)) for n in range(readers)]
+        if writing:
+            threads.append(threading.Thread(target=write))
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return sum(reads) / seconds, writes[0] / seconds
+
+    print('%d words, %d reader threads' % (count, readers))
+    print('reads only:    %10.0f reads/s' % run(False)[0])
+    print('with a writer: %10.0f reads/s, %8.0f writes/s' % run(True))
+
+
+def bench_many(count=100000, diff=100000, repeat=3):
+    """Compares insert_many, contains_many and remove_many against one call per word, best of
+    repeat runs; fails if a batched call loses to its loop
+    """
+    words = generate_words(count)
+    changes = generate_words(diff, seed=1)
+    rand = random.Random(0)
+    rand.shuffle(changes)
+
+    def single():
+        trie = build_trie(words)
+        start = time.perf_counter()
+        for word in changes:
+            trie.insert_word(word)
+        inserted = time.perf_counter() - start
+        searched = timed(lambda: [trie.search_word(word) for word in changes])[1]
+        removed = timed(lambda: [trie.remove_word(word, trie.root) for word in changes])[1]
+        return inserted, searched, removed
+
+    def batched():
+        trie = build_trie(words)
+        inserted = timed(trie.insert_many, changes)[1]
+        searched = timed(trie.contains_many, changes)[1]
+        removed = timed(trie.remove_many, changes)[1]
+        return inserted, searched, removed
+
+    per_word = [min(times) for times in zip(*[single() for _ in range(repeat)])]
+    batch = [min(times) for times in zip(*[batched() for _ in range(repeat)])]
+    print('%d words, %d word diff' % (count, diff))
+    print('%-10s %8s %8s %8s' % ('seconds', 'insert', 'search', 'remove'))
+    print('%-10s %8.3f %8.3f %8.3f' % (('per word',) + tuple(per_word)))
+    print('%-10s %8.3f %8.3f %8.3f' % (('batched',) + tuple(batch)))
+    slower = [name for name, one, many in zip(('insert_many', 'contains_many', 'remove_many'), per_word, batch)
+              if many > one]
+    if slower:
+        raise AssertionError(', '.join(slower) + ' slower than calling once per word')
+
+
+def bench_optimize(count=100000, sizes=(4, 5), moves=300, seconds=5.0):
+    """Compares re-scoring a board after one cell changes against solving it again, then anneals
+    """
+    words = generate_words(count)
+    trie = build_trie(words)
+    gaddag, seconds_built = timed(build_gaddag, words)
+    print('%d words, GADDAG of %d nodes built in %.1f s' % (count, gaddag.node_count(), seconds_built))
+
+    print('%-6s %14s %14s' % ('board', 'ms re-scored', 'ms re-solved'))
+    for size in sizes:
+        rand = random.Random(0)
+        changes = [(rand.randrange(size * size), rand.choice(LETTERS)) for _ in range(moves)]
+        board = IncrementalSolver(gaddag, generate_board(size))
+        rescored = timed(lambda: [board.set_cell(i, letter) for i, letter in changes])[1]
+        assert sorted(board.counts) == sorted(trie.word_hunt(board.matrix()))
+
+        board = IncrementalSolver(gaddag, generate_board(size))
+
+        def resolve():
+            for i, letter in changes:
+                board.cells[i] = letter
+                trie.word_hunt(board.matrix())
+        resolved = timed(resolve)[1]
+        print('%-6s %14.3f %14.3f' % ('%dx%d' % (size, size), 1000 * rescored / moves, 1000 * resolved / moves))
+
+    score, found, matrix = anneal(gaddag, seconds=seconds, letters=letter_weights(words), seed=0)
+    print('annealed %.0f s: %d points, %d words, %s' % (seconds, score, found, matrix))
+
+
+def levenshtein(word, other):
+    """Returns edit distance between word and other, filling the whole table
+    """
+    previous = list(range(len(other) + 1))
+    for i, letter in enumerate(word, 1):
+        row = [i]
+        for j, other_letter in enumerate(other, 1):
+            row.append(min(row[-1] + 1, previous[j] + 1, previous[j - 1] + (letter != other_letter)))
+        previous = row
+    return previous[-1]
+
+
+def bench_fuzzy(count=100000, queries=50, scanned=3, k=10):
+    """Compares fuzzy_search against scanning get_library with a full edit distance per word
+    """
+    words = generate_words(count)
+    trie = build_trie(words)
+    rand = random.Random(0)
+    typos = []
+    for word in rand.sample(words, queries):    # one substitution, insertion or deletion each
+        i = rand.randrange(len(word))
+        typos.append(rand.choice([word[:i] + rand.choice(LETTERS) + word[i + 1:], word[:i] + rand.choice(LETTERS) + word[i:],
+                                  word[:i] + word[i + 1:]]))
+
+    def scan(word, max_edits):
+        ranked = sorted((distance, -trie.search_prefix(known)._count, known)
+                        for known, distance in ((known, levenshtein(word, known)) for known in trie.get_library(trie.root))
+                        if distance <= max_edits)
+        return [(known, distance) for distance, _, known in ranked[:k]]
+
+    print('%d words, %d queries' % (count, queries))
+    print('%-10s %14s %14s' % ('max edits', 'ms trie', 'ms scan'))
+    for max_edits in (1, 2):
+        searched = timed(lambda: [trie.fuzzy_search(word, max_edits, k) for word in typos])[1]
+        scanned_seconds = timed(lambda: [scan(word, max_edits) for word in typos[:scanned]])[1]
+        for word in typos[:scanned]:
+            assert trie.fuzzy_search(word, max_edits, k) == scan(word, max_edits)
+        print('%-10d %14.2f %14.2f' % (max_edits, 1000 * searched / queries, 1000 * scanned_seconds / scanned))
+
+
+def bench_match(count=100000, patterns=('ca?', 'st*ing', 'b[aeiou]?[aeiou]*', '*ing', '*ea*', 'e?????????')):
+    """Compares match, with and without a SuffixIndex, against regex scanning get_library
+    """
+    words = generate_words(count)
+    trie = build_trie(words)
+    index, seconds = timed(SuffixIndex, trie)
+    print('%d words, SuffixIndex built in %.1f s' % (count, seconds))
+    print('%-20s %7s %10s %10s %10s' % ('pattern', 'matches', 'ms match', 'ms index', 'ms scan'))
+    for pattern in patterns:
+        matched, searched = timed(trie.match, pattern)
+        indexed = timed(trie.match, pattern, index)[1]
+        regex = re.compile(fnmatch.translate(pattern))
+        scanned, scanned_seconds = timed(lambda: sorted(word for word in trie.get_library(trie.root) if regex.match(word)))
+        assert matched == scanned
+        print('%-20s %7d %10.2f %10.2f %10.2f' % (pattern, len(matched), 1000 * searched, 1000 * indexed, 1000 * scanned_seconds))
+
+
+def bench_rank(count=100000, queries=1000, scanned=20):
+    """Compares count_prefix, rank and select against walking iter_library in sorted order,
+    and times insert_word and remove_word now that they keep subtree counts
+    """
+    words = generate_words(count)
+    trie, built = timed(build_trie, words)
+    rand = random.Random(0)
+    sample = rand.sample(words, queries)
+    positions = [rand.randrange(count) for _ in range(queries)]
+
+    def scan_count(prefix):
+        return sum(1 for _ in trie.iter_library(trie.search_prefix(prefix), prefix))
+
+    def scan_rank(word):
+        return sum(1 for _ in itertools.takewhile(lambda known: known < word, trie.iter_library(sort=True)))
+
+    def scan_select(k):
+        return next(itertools.islice(trie.iter_library(sort=True), k, None))
+
+    for word in sample[:scanned]:
+        assert trie.rank(word) == scan_rank(word) == words.index(word)
+        assert trie.count_prefix(word[:2]) == scan_count(word[:2])
+    for k in positions[:scanned]:
+        assert trie.select(k) == scan_select(k) == words[k]
+
+    print('%d words, built with insert_word in %.2f s' % (count, built))
+    print('%-14s %14s %14s' % ('query', 'us trie', 'us scan'))
+    for name, query, scan, arguments in (('count_prefix', trie.count_prefix, scan_count,
+                                          [word[:2] for word in sample]),
+                                         ('rank', trie.rank, scan_rank, sample),
+                                         ('select', trie.select, scan_select, positions)):
+        searched = timed(lambda: [query(argument) for argument in arguments])[1]
+        scanned_seconds = timed(lambda: [scan(argument) for argument in arguments[:scanned]])[1]
+        print('%-14s %14.2f %14.2f' % (name, 1e6 * searched / queries, 1e6 * scanned_seconds / scanned))
+    removed = timed(lambda: [trie.remove_word(word, trie.root) for word in sample])[1]
+    inserted = timed(lambda: [trie.insert_word(word) for word in sample])[1]
+    print('%-14s %14.2f' % ('remove_word', 1e6 * removed / queries))
+    print('%-14s %14.2f' % ('insert_word', 1e6 * inserted / queries))
+
+
+def bench_incremental(count=100000, sizes=(4, 10, 20), updates=100):
+    """Compares IncrementalSolver.update_cell against running word_hunt on the whole board again
+    """
+    words = generate_words(count)
+    trie = build_trie(words)
+    gaddag = build_gaddag(words)
+    print('%d words, %d updates per board' % (count, updates))
+    print('%-6s %14s %14s' % ('board', 'ms updated', 'ms re-solved'))
+    for size in sizes:
+        rand = random.Random(0)
+        changes = [(rand.randrange(size), rand.randrange(size), rand.choice(LETTERS)) for _ in range(updates)]
+        matrix = generate_board(size)
+        solver = IncrementalSolver(gaddag, matrix)
+        updated = timed(lambda: [solver.update_cell(y, x, letter) for y, x, letter in changes])[1]
+
+        def resolve():
+            for y, x, letter in changes:
+                matrix[y][x] = letter
+                trie.word_hunt(matrix)
+        resolved = timed(resolve)[1]
+        assert sorted(solver.words()) == sorted(trie.word_hunt(matrix))
+        print('%-6s %14.3f %14.3f' % ('%dx%d' % (size, size), 1000 * updated / updates, 1000 * resolved / updates))
+
+
+def bench_service(count=100000, clients=50, large=40, seconds=2.0):
+    """Times small boards answered by SolverService while clients also send large boards
+    """
+    words = generate_words(count)
+    service = SolverService(build_trie(words), deadline=seconds)
+    small = [generate_board(4, seed) for seed in range(clients)]
+    big = [generate_board(large, seed) for seed in range(4)]
+
+    async def run():
+        async def timed_solve(matrix):
+            start = time.perf_counter()
+            reply = await service.solve(matrix)
+            return time.perf_counter() - start, reply
+
+        heavy = [asyncio.ensure_future(timed_solve(matrix)) for matrix in big]
+        await asyncio.sleep(0.05)
+        light = await asyncio.gather(*[timed_solve(matrix) for matrix in small + small])
+        heavy = await asyncio.gather(*heavy)
+        return light, heavy
+
+    light, heavy = asyncio.run(run())
+    service.close()
+    latencies = sorted(seconds for seconds, _ in light)
+    print('%d words, %d small boards sent twice during %d %dx%d boards' % (count, clients, len(big), large, large))
+    print('small boards: median %.3f s, worst %.3f s, %d searches for %d requests, %d busy' % (
+        latencies[len(latencies) // 2], latencies[-1], service.solves - len(big), len(light), service.rejected))
+    print('large boards: %d of %d complete, slowest %.3f s' % (sum(reply.get('complete', False) for _, reply in heavy),
+                                                              len(heavy), max(seconds for seconds, _ in heavy)))
+
+
+def suite(word_counts=(1000, 10000, 100000, 500000), board_sizes=(3, 4, 5, 10, 20), boards=5, sample=10000, repeat=3):
+    """Times the core Trie operations across dictionary and board sizes
+
+    Each operation is timed untraced repeat times, keeping the best, then run once more under
+    tracemalloc for its peak memory.
+    Lookups and removals use a sample of the dictionary; words and boards are generated from fixed
+    seeds, so every run measures the same work
+
+    :param word_counts: dictionary sizes to try, defaults to 1k up to 500k words
+    :type word_counts: tuple, optional
+    :param board_sizes: board widths to run word_hunt on, defaults to 3x3 up to 20x20
+    :type board_sizes: tuple, optional
+    :param boards: number of boards of each size, defaults to 5
+    :type boards: int, optional
+    :param sample: most words used for lookups and removals, defaults to 10000
+    :type sample: int, optional
+    :param repeat: number of timed runs of each operation, defaults to 3
+    :type repeat: int, optional
+    :return: {'meta': run details, 'results': list of result dicts}
+    :rtype: dict
+    """
+    results = []
+
+    def run(operation, count, calls, function, setup=None, board=None):
+        seconds = None
+        for _ in range(repeat):
+            if setup:
+                setup()
+            elapsed = timed(function)[1]
+            seconds = elapsed if seconds is None else min(seconds, elapsed)
+        if setup:
+            setup()
+        peak = allocated(function)[2]
+        results.append({'operation': operation, 'words': count, 'board': board, 'calls': calls,
+                        'seconds': seconds, 'per_second': calls / seconds if seconds else None, 'peak_bytes': peak})
+        print('%-18s %7d words %6s %10.4f s %12d peak bytes' % (operation, count, board and '%dx%d' % (board, board) or '',
+                                                                seconds, peak), file=sys.stderr)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for count in word_counts:
+            words = generate_words(count)
+            sampled = random.Random(1).sample(words, min(sample, count))
+            file_name = os.path.join(directory, 'words.txt')
+            with open(file_name, 'w') as writer:
+                writer.write('\n'.join(words))
+
+            run('insert_word', count, count, lambda: build_trie(words))
+            trie = build_trie(words)
+            run('search_word', count, len(sampled), lambda: [trie.search_word(word) for word in sampled])
+            run('search_prefix', count, len(sampled), lambda: [trie.search_prefix(word[:3]) for word in sampled])
+            run('get_library', count, 1, lambda: trie.get_library(trie.root))
+            run('remove_word', count, len(sampled), lambda: [trie.remove_word(word, trie.root) for word in sampled],
+                setup=lambda: trie.insert_many(sampled))
+            run('convert_from_text', count, 1, lambda: Trie().convert_from_text(file_name))
+
+            trie.insert_many(sampled)
+            for size in board_sizes:
+                matrices = [generate_board(size, seed) for seed in range(boards)]
+                run('word_hunt', count, boards, lambda: [trie.word_hunt(matrix) for matrix in matrices], board=size)
+            del trie
+
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                         stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    meta = {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'boards': boards, 'sample': sample, 'repeat': repeat}
+    return {'meta': meta, 'results': results}
+
+
+def compare(old, new):
+    """Prints how each result in new changed against the matching result in old
+
+    :param old: suite results from an earlier run
+    :type old: dict
+    :param new: suite results from this run
+    :type new: dict
+    """
+    before = {(r['operation'], r['words'], r['board']): r for r in old['results']}
+    print('%-18s %7s %6s %10s %10s' % ('operation', 'words', 'board', 'time', 'peak mem'))
+    for result in new['results']:
+        key = (result['operation'], result['words'], result['board'])
+        if key not in before:
+            continue
+        old_result = before[key]
+        print('%-18s %7d %6s %9.2fx %9.2fx' % (key[0], key[1], key[2] or '', result['seconds'] / old_result['seconds'],
+                                              result['peak_bytes'] / max(old_result['peak_bytes'], 1)))
+
+
+BENCHMARKS = {
+    'nodes': bench_nodes,
+    'compact': bench_compact,
+    'load': bench_load,
+    'build': bench_build,
+    'batch': bench_batch,
+    'prune': bench_prune,
+    'autocomplete': bench_autocomplete,
+    'concurrent': bench_concurrent,
+    'many': bench_many,
+    'optimize': bench_optimize,
+    'incremental': bench_incremental,
+    'fuzzy': bench_fuzzy,
+    'match': bench_match,
+    'rank': bench_rank,
+    'service': bench_service,
+}
+
+
+def main(argv=None):
+    """Runs benchmarks named on the command line, all but the suite by default
+    """
+    parser = argparse.ArgumentParser(description='Benchmarks for the trie data structures')
+    parser.add_argument('names', nargs='*', choices=sorted(BENCHMARKS) + ['suite'], default=list(BENCHMARKS),
+                        metavar='name', help='benchmarks to run: suite, ' + ', '.join(BENCHMARKS))
+    parser.add_argument('--words', help='comma separated dictionary sizes for the suite')
+    parser.add_argument('--boards', help='comma separated board sizes for the suite')
+    parser.add_argument('--quick', action='store_true', help='run the suite on small sizes only')
+    parser.add_argument('--output', help='write suite results to this JSON file instead of stdout')
+    parser.add_argument('--compare', metavar='JSON', help='compare suite results with an earlier JSON file')
+    args = parser.parse_args(argv)
+
+    for name in args.names:
+        if name != 'suite':
+            BENCHMARKS[name]()
+            continue
+
+        options = {}
+        if args.quick:
+            options = {'word_counts': (1000, 10000), 'board_sizes': (3, 4, 5)}
+        if args.words:
+            options['word_counts'] = tuple(int(count) for count in args.words.split(','))
+        if args.boards:
+            options['board_sizes'] = tuple(int(size) for size in args.boards.split(','))
+        results = suite(**options)
+
+        if args.output:
+            with open(args.output, 'w') as writer:
+                json.dump(results, writer, indent=2)
+        else:
+            json.dump(results, sys.stdout, indent=2)
+            print()
+        if args.compare:
+            with open(args.compare) as reader:
+                compare(json.load(reader), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+"""Searches for boards holding the most words or points by local search over their letters
+
+Re-scoring a board after one cell changes only needs the paths through that cell. Those are found
+with a GADDAG: for every word and every split point it stores the letters up to the split reversed,
+then SEPARATOR, then the rest of the word, so a walk can start at the changed cell, extend backwards
+to the first letter of a word and then forwards to its last. IncrementalSolver keeps a board's words
+and paths up to date this way, for boards that change a cell at a time
+"""
+import math
+import os
+import random
+import tempfile
+import time
+from bisect import bisect_left
+from collections import Counter
+from multiprocessing import Pool
+
+from tries import CompactTrie, Trie, canonical_board, compile_board, score_word
+
+SEPARATOR = '>'                 # marks where a GADDAG entry turns from reversed prefix to suffix
+OBJECTIVES = ('points', 'words')
+
+_gaddag = None                  # GADDAG loaded once per worker process by _init_worker
+
+
+def build_gaddag(words):
+    """Returns a compact GADDAG of words: rev(word[:k]) + SEPARATOR + word[k:] for every 1 <= k <= len(word)
+
+    :param words: words to store, none containing SEPARATOR
+    :type words: iterable
+    :rtype: CompactTrie
+    """
+    entries = set()
+    for word in words:
+        for k in range(1, len(word) + 1):
+            entries.add(word[k - 1::-1] + SEPARATOR + word[k:])
+    return CompactTrie.from_sorted(sorted(entries))
+
+
+def _letter_library(dictionary):
+    """Returns words of a Trie or CompactTrie for build_gaddag, which splits board cells into letters
+
+    :raises ValueError: if dictionary's alphabet has multi-letter tokens, which word_hunt would treat
+        as single tiles and a GADDAG of letters cannot
+    :rtype: list
+    """
+    if dictionary.alphabet.tokens:
+        raise ValueError('GADDAG search splits cells into letters, so dictionaries with tokens ' +
+                         ', '.join(dictionary.alphabet.tokens) + ' are not supported')
+    if isinstance(dictionary, CompactTrie):
+        return dictionary.get_library()
+    return list(dictionary.iter_library())
+
+
+def letter_weights(words):
+    """Returns (letters, weights) with how often each letter occurs in words, to draw board letters from
+
+    :param words: words to count letters of
+    :type words: iterable
+    :rtype: tuple
+    """
+    counts = Counter()
+    for word in words:
+        counts.update(word)
+    letters = sorted(counts)
+    return tuple(letters), tuple(counts[letter] for letter in letters)
+
+
+class IncrementalSolver:
+
+    def __init__(self, gaddag, matrix, objective='points'):
+        """Initialization of a board whose words and paths are kept up to date as its cells change
+
+        Every path spelling a word is kept, so changing a cell drops the paths through it and searches
+        again only from it, finding the same words as word_hunt on the changed board. Cells are split
+        into letters, as with the default alphabet
+
+        :param gaddag: GADDAG built by build_gaddag, shared by any number of boards, or a Trie to build
+            one from (slow, so build once for many boards)
+        :type gaddag: CompactTrie or Trie
+        :raises ValueError: if gaddag is a Trie whose alphabet has multi-letter tokens
+        :param matrix: starting board
+        :type matrix: nested list
+        :param objective: 'points' to score words by score_word, 'words' to count them, defaults to 'points'
+        :type objective: str, optional
+        """
+        if isinstance(gaddag, Trie):
+            gaddag = build_gaddag(_letter_library(gaddag))
+        self._gaddag = gaddag
+        self._objective = objective
+        self._widths = [len(row) for row in matrix]
+        self.cells, self.coordinates, self.neighbors = compile_board(matrix)
+        self._numbers = {coordinate: i for i, coordinate in enumerate(self.coordinates)}
+        self.predecessors = [[] for _ in self.cells]       # moves into each cell, for walking backwards
+        for i, adjacent in enumerate(self.neighbors):
+            for j, _ in adjacent:
+                self.predecessors[j].append((i, 1 << i))
+        self.paths = {}         # stores {path: word it spells} for every path of cell numbers spelling a word
+        self._through = [set() for _ in self.cells]     # paths through each cell
+        self.counts = {}        # stores {word: number of paths spelling it}
+        self.score = 0
+
+        stack = []              # every path, anchored at its first cell
+        for i, cell in enumerate(self.cells):
+            node = gaddag._follow(gaddag.root, cell[::-1])
+            if node is not None:
+                node = gaddag.get_child(node, SEPARATOR)
+            if node is not None:
+                stack.append((1 << i, node, (i,), True))
+        for word, path in self._search(stack):
+            self._add(word, path)
+
+    def matrix(self):
+        """Returns the board as a nested list
+        """
+        matrix = []
+        i = 0
+        for width in self._widths:
+            matrix.append(self.cells[i:i + width])
+            i += width
+        return matrix
+
+    def update_cell(self, y, x, letter):
+        """Changes the cell in row y, column x to letter
+
+        :param y: row of the cell
+        :type y: int
+        :param x: column of the cell
+        :type x: int
+        :param letter: new value of the cell
+        :type letter: str
+        :raises IndexError: if there is no such cell
+        :return: (words no longer on the board, words newly on it), each sorted
+        :rtype: tuple
+        """
+        i = self._numbers.get((x, y))
+        if i is None:
+            raise IndexError('no cell at row ' + str(y) + ', column ' + str(x))
+        _, _, removed, added = self.set_cell(i, letter)
+        removed = Counter(word for word, _ in removed)
+        added = Counter(word for word, _ in added)
+        lost = sorted(word for word in removed if word not in self.counts)
+        gained = sorted(word for word in added if word not in removed and self.counts[word] == added[word])
+        return lost, gained
+
+    def words(self):
+        """Returns list of words on the board, as word_hunt would
+        """
+        return list(self.counts)
+
+    def word_paths(self, word):
+        """Returns list of every path spelling word, each a tuple of (x, y) coordinates as in word_hunt_paths
+
+        :param word: word to find
+        :type word: str
+        :rtype: list
+        """
+        if word not in self.counts:
+            return []
+        return [tuple(self.coordinates[i] for i in path) for path, spelled in self.paths.items() if spelled == word]
+
+    def paths_through(self, i):
+        """Generator of (word, path) for every path of cell numbers through cell i that spells a word
+
+        :param i: number of the cell
+        :type i: int
+        """
+        node = self._gaddag._follow(self._gaddag.root, self.cells[i][::-1])
+        if node is not None:
+            yield from self._search([(1 << i, node, (i,), False)])
+
+    def _search(self, stack):
+        """Generator of (word, path) for every word reached from the GADDAG walks on stack
+
+        Each walk is (visited, node, path, forwards). Walking backwards, path is kept reversed and
+        extends through predecessors until the node has a SEPARATOR edge, where the walk also turns
+        forwards with path put back in order. Either way the current cell is path[-1]
+        """
+        gaddag = self._gaddag
+        cells = self.cells
+        label_ids = gaddag._label_ids
+        first = gaddag._first
+        edge_labels = gaddag._edge_labels
+        edge_targets = gaddag._edge_targets
+        ends = gaddag._ends
+        turn = label_ids.get(SEPARATOR)
+        neighbors = self.neighbors
+        predecessors = self.predecessors
+        if turn is None:        # empty GADDAG
+            return
+
+        while stack:
+            visited, node, path, forwards = stack.pop()
+            low = first[node]
+            high = first[node + 1]
+            if forwards:
+                if ends[node]:
+                    yield ''.join([cells[j] for j in path]), path
+                moves = neighbors[path[-1]]
+            else:
+                e = bisect_left(edge_labels, turn, low, high)
+                if e < high and edge_labels[e] == turn:
+                    stack.append((visited, edge_targets[e], path[::-1], True))
+                moves = predecessors[path[-1]]
+            if low == high:
+                continue
+
+            for k, bit in moves:
+                if visited & bit:
+                    continue
+                cell = cells[k]
+                if len(cell) == 1:
+                    label = label_ids.get(cell)
+                    if label is None:
+                        continue
+                    e = bisect_left(edge_labels, label, low, high)
+                    if e == high or edge_labels[e] != label:
+                        continue
+                    child = edge_targets[e]
+                else:
+                    child = gaddag._follow(node, cell if forwards else cell[::-1])
+                    if child is None:
+                        continue
+                stack.append((visited | bit, child, path + (k,), forwards))
+
+    def set_cell(self, i, letter):
+        """Changes cell i to letter; paths through it are dropped and only those are searched again
+
+        :param i: number of the cell
+        :type i: int
+        :param letter: new value of the cell
+        :type letter: str
+        :return: change to pass to undo
+        :rtype: tuple
+        """
+        removed = [(self.paths[path], path) for path in self._through[i]]
+        for word, path in removed:
+            self._remove(word, path)
+        old = self.cells[i]
+        self.cells[i] = letter
+        added = list(self.paths_through(i))
+        for word, path in added:
+            self._add(word, path)
+        return i, old, removed, added
+
+    def undo(self, change):
+        """Reverts a change returned by set_cell without searching the board again
+        """
+        i, old, removed, added = change
+        for word, path in added:
+            self._remove(word, path)
+        self.cells[i] = old
+        for word, path in removed:
+            self._add(word, path)
+
+    def _value(self, word):
+        return score_word(word) if self._objective == 'points' else 1
+
+    def _add(self, word, path):
+        self.paths[path] = word
+        for j in path:
+            self._through[j].add(path)
+        count = self.counts.get(word, 0)
+        self.counts[word] = count + 1
+        if not count:
+            self.score += self._value(word)
+
+    def _remove(self, word, path):
+        del self.paths[path]
+        for j in path:
+            self._through[j].discard(path)
+        count = self.counts[word] - 1
+        if count:
+            self.counts[word] = count
+        else:
+            del self.counts[word]
+            self.score -= self._value(word)
+
+
+def anneal(gaddag, rows=4, columns=4, seconds=10.0, objective='points', letters=None, seed=None, steps=None,
+           temperature=(2.0, 0.05)):
+    """Simulated annealing from a random board: changes one cell at a time, keeping changes that
+    score at least as well and worse ones with a chance that shrinks as the board cools
+
+    :param gaddag: GADDAG built by build_gaddag
+    :type gaddag: CompactTrie
+    :param rows: number of rows, defaults to 4
+    :type rows: int, optional
+    :param columns: number of columns, defaults to 4
+    :type columns: int, optional
+    :param seconds: time budget, defaults to 10.0
+    :type seconds: float, optional
+    :param objective: 'points' or 'words', defaults to 'points'
+    :type objective: str, optional
+    :param letters: (letters, weights) to draw cells from, defaults to the GADDAG's letters evenly
+    :type letters: tuple, optional
+    :param seed: random seed, defaults to None
+    :type seed: int, optional
+    :param steps: number of changes to try instead of running for seconds, defaults to None
+    :type steps: int, optional
+    :param temperature: (starting, final) temperature in points, defaults to (2.0, 0.05)
+    :type temperature: tuple, optional
+    :return: (score, number of words, board) of the best board seen
+    :rtype: tuple
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError('objective must be one of ' + ', '.join(OBJECTIVES))
+    rand = random.Random(seed)
+    if letters is None:
+        letters = [label for label in gaddag._labels if label != SEPARATOR], None
+    choices, weights = letters
+
+    def draw():
+        return rand.choices(choices, weights)[0]
+
+    board = IncrementalSolver(gaddag, [[draw() for _ in range(columns)] for _ in range(rows)], objective)
+    best = (board.score, len(board.counts), board.matrix())
+    hot, cold = temperature
+    start = time.perf_counter()
+    step = 0
+    while True:
+        if steps is not None:
+            if step >= steps:
+                break
+            progress = step / steps
+        else:
+            progress = (time.perf_counter() - start) / seconds
+            if progress >= 1:
+                break
+        step += 1
+
+        i = rand.randrange(len(board.cells))
+        letter = draw()
+        if letter == board.cells[i]:
+            continue
+        before = board.score
+        change = board.set_cell(i, letter)
+        delta = board.score - before
+        if delta >= 0 or rand.random() < math.exp(delta / (hot * (cold / hot) ** progress)):
+            if board.score > best[0]:
+                best = (board.score, len(board.counts), board.matrix())
+        else:
+            board.undo(change)
+    return best
+
+
+def _init_worker(file_name):
+    """Pool initializer: maps the saved GADDAG into the worker process
+    """
+    global _gaddag
+    _gaddag = CompactTrie.load(file_name)
+
+
+def _restart(task):
+    """Runs one anneal in a worker from task (seed, rows, columns, seconds, objective, letters)
+    """
+    seed, rows, columns, seconds, objective, letters = task
+    return anneal(_gaddag, rows, columns, seconds, objective, letters, seed)
+
+
+def optimize_boards(dictionary, rows=4, columns=4, seconds=10.0, restarts=None, workers=None, objective='points',
+                    keep=5, seed=0):
+    """Runs anneal from several random boards across a pool of processes, returns the best boards found
+
+    The GADDAG is built once and saved to a file that workers map, as in batch.solve_boards.
+    Restarts run workers at a time, so this takes about seconds * ceil(restarts / workers) plus the build
+
+    :param dictionary: words boards are scored with
+    :type dictionary: Trie, CompactTrie or iterable
+    :param rows: number of rows, defaults to 4
+    :type rows: int, optional
+    :param columns: number of columns, defaults to 4
+    :type columns: int, optional
+    :param seconds: time budget of each restart, defaults to 10.0
+    :type seconds: float, optional
+    :param restarts: number of boards to anneal, defaults to workers
+    :type restarts: int, optional
+    :param workers: number of worker processes, defaults to os.cpu_count()
+    :type workers: int, optional
+    :param objective: 'points' or 'words', defaults to 'points'
+    :type objective: str, optional
+    :param keep: most boards to return, defaults to 5
+    :type keep: int, optional
+    :param seed: seed of the first restart, the rest count up from it, defaults to 0
+    :type seed: int, optional
+    :raises ValueError: if objective is unknown, or dictionary's alphabet has multi-letter tokens
+    :return: list of (score, number of words, board) best first, one per board up to rotation and reflection
+    :rtype: list
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError('objective must be one of ' + ', '.join(OBJECTIVES))
+    if isinstance(dictionary, (Trie, CompactTrie)):
+        words = _letter_library(dictionary)
+    else:
+        words = list(dictionary)
+    workers = workers or os.cpu_count()
+    restarts = restarts or workers
+    letters = letter_weights(words)
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, 'gaddag.trie')
+        build_gaddag(words).save(file_name)
+        tasks = [(seed + restart, rows, columns, seconds, objective, letters) for restart in range(restarts)]
+        with Pool(workers, initializer=_init_worker, initargs=(file_name,)) as pool:
+            results = pool.map(_restart, tasks)
+
+    best = {}
+    for result in sorted(results, reverse=True):
+        best.setdefault(canonical_board(result[2]), result)
+    return list(best.values())[:keep]
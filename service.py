@@ -0,0 +1,261 @@
+"""Serves word_hunt over a socket to many clients at once
+
+Run as a script: python service.py words.txt [--unix PATH | --host HOST --port PORT]
+
+The protocol is JSON lines. Each request is an object {"id": any, "board": nested list, "deadline":
+seconds} where id and deadline are optional; each reply carries the request's id along with either
+"words" (sorted) and "complete" (false when the deadline cut the search short), or "error", which is
+"busy" when too many boards are already being solved. Replies to one connection come back in the
+order their boards finish, not the order they were sent
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tries import Trie, canonical_board
+
+LINE_LIMIT = 1 << 20            # longest request line in bytes
+
+
+class _Solve:
+
+    def __init__(self, matrix, deadline):
+        """Initialization of one solve shared by every request for the same board
+
+        :param matrix: matrix to search through
+        :type matrix: nested list
+        :param deadline: time.perf_counter() value the search stops at
+        :type deadline: float
+        """
+        self.matrix = matrix
+        self.deadline = deadline
+        self.words = []         # words found so far, appended to by the executor thread
+        self.future = None      # resolves to whether the search finished before the deadline
+
+
+class SolverService:
+
+    def __init__(self, dictionary, workers=None, max_pending=64, deadline=5.0, large=100, large_workers=1):
+        """Initialization of a service solving boards with one dictionary, loaded once
+
+        Searches run in bounded thread pools so the event loop keeps answering while they do. Boards
+        of at least large cells get their own pool, so small boards never queue behind them.
+        Identical boards, up to rotation and reflection, requested while one of them is being
+        solved share that solve, as long as it runs at least until the later request's deadline
+
+        :param dictionary: trie to search with, or name of a text file to load one from
+        :type dictionary: Trie or str
+        :param workers: number of executor threads, defaults to ThreadPoolExecutor's default
+        :type workers: int, optional
+        :param max_pending: most distinct boards queued or being solved before replying busy, defaults to 64
+        :type max_pending: int, optional
+        :param deadline: default and longest deadline of a request in seconds, defaults to 5.0
+        :type deadline: float, optional
+        :param large: number of cells from which a board counts as large, defaults to 100
+        :type large: int, optional
+        :param large_workers: number of executor threads for large boards, defaults to 1
+        :type large_workers: int, optional
+        """
+        if isinstance(dictionary, str):
+            trie = Trie()
+            trie.convert_from_text(dictionary)
+            dictionary = trie
+        self._trie = dictionary
+        self._executor = ThreadPoolExecutor(workers)
+        self._large_executor = ThreadPoolExecutor(large_workers)
+        self.large = large
+        self._solving = {}      # stores {canonical board: _Solve} for the latest solve of each board
+        self._pending = 0       # solves queued or being solved, including those no longer in _solving
+        self.max_pending = max_pending
+        self.deadline = deadline
+        self.solves = 0         # searches started
+        self.coalesced = 0      # requests that shared a search already started
+        self.rejected = 0       # requests answered busy
+
+    def __repr__(self):
+        """Returns string representation of service; for use in debugging
+        """
+        return 'SolverService(solves=%d, coalesced=%d, rejected=%d, pending=%d)' % (
+            self.solves, self.coalesced, self.rejected, self._pending)
+
+    async def solve(self, matrix, deadline=None):
+        """Finds the words within matrix without blocking the event loop
+
+        :param matrix: matrix to search through
+        :type matrix: nested list
+        :param deadline: seconds to wait for words, at most the service's deadline, defaults to it
+        :type deadline: float, optional
+        :raises ValueError: if matrix is not a list of rows of strings, or deadline is not a finite number
+        :return: {'words': sorted list, 'complete': bool}, or {'error': 'busy'}
+        :rtype: dict
+        """
+        if not isinstance(matrix, list) or not all(isinstance(row, list) and all(isinstance(cell, str) for cell in row)
+                                                   for row in matrix):
+            raise ValueError('board must be a list of rows of strings')
+        if deadline is not None and not math.isfinite(deadline):
+            raise ValueError('deadline must be a finite number of seconds')
+        seconds = self.deadline if deadline is None else min(max(float(deadline), 0.0), self.deadline)
+        deadline = time.perf_counter() + seconds
+
+        key = canonical_board(matrix)
+        solve = self._solving.get(key)
+        if solve is not None and solve.deadline >= deadline:     # stops no sooner than this request's
+            self.coalesced += 1
+        elif self._pending >= self.max_pending:
+            self.rejected += 1
+            return {'error': 'busy'}
+        else:
+            solve = self._solving[key] = _Solve(matrix, deadline)
+            executor = self._large_executor if sum(map(len, matrix)) >= self.large else self._executor
+            solve.future = asyncio.get_running_loop().run_in_executor(executor, self._search, solve)
+            solve.future.add_done_callback(lambda _, solve=solve: self._finish(key, solve))
+            self._pending += 1
+            self.solves += 1
+
+        try:
+            complete = await asyncio.wait_for(asyncio.shield(solve.future), max(deadline - time.perf_counter(), 0))
+        except asyncio.TimeoutError:
+            complete = False
+        return {'words': sorted(solve.words), 'complete': complete}
+
+    def _finish(self, key, solve):
+        """Forgets solve once its search ends, unless a later solve of the board replaced it; returns None
+        """
+        self._pending -= 1
+        if self._solving.get(key) is solve:
+            del self._solving[key]
+
+    def _search(self, solve):
+        """Runs in an executor thread: adds words to solve.words until done or past its deadline,
+        returns whether the search finished
+        """
+        budget = solve.deadline - time.perf_counter()
+        if budget <= 0:                 # waited in the queue past the deadline
+            return False
+        for word in self._trie.iter_word_hunt(solve.matrix, time_budget=budget):
+            solve.words.append(word)
+        return time.perf_counter() < solve.deadline
+
+    async def start(self, path=None, host='127.0.0.1', port=0):
+        """Starts listening on a Unix socket at path, or else on host and port
+
+        :param path: Unix socket to listen on, defaults to None
+        :type path: str, optional
+        :param host: address to listen on, defaults to localhost
+        :type host: str, optional
+        :param port: port to listen on, defaults to 0 (any free port)
+        :type port: int, optional
+        :rtype: asyncio.Server
+        """
+        if path is not None:
+            return await asyncio.start_unix_server(self._serve, path, limit=LINE_LIMIT)
+        return await asyncio.start_server(self._serve, host, port, limit=LINE_LIMIT)
+
+    def close(self):
+        """Stops the executors once running searches end; returns None
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._large_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _serve(self, reader, writer):
+        """Answers every request line from one connection, solving its boards concurrently; lines
+        over LINE_LIMIT are answered with an error and skipped
+        """
+        replies = set()
+        try:
+            while True:
+                try:
+                    line = await self._read_line(reader)
+                except ConnectionError:
+                    break
+                if line is None:
+                    task = asyncio.ensure_future(self._write(writer, {'error': 'bad request: line too long'}))
+                elif not line:
+                    break
+                else:
+                    task = asyncio.ensure_future(self._reply(line, writer))
+                replies.add(task)
+                task.add_done_callback(replies.discard)
+        finally:
+            if replies:
+                await asyncio.gather(*replies, return_exceptions=True)
+            writer.close()
+
+    async def _read_line(self, reader):
+        """Returns next line from reader, b'' at the end of the stream, or None for a line over
+        LINE_LIMIT, which is read up to its newline and dropped
+        """
+        try:
+            return await reader.readuntil(b'\n')
+        except asyncio.IncompleteReadError as error:    # last line without a newline
+            return error.partial
+        except asyncio.LimitOverrunError as error:      # data is left in the buffer
+            consumed = error.consumed
+        while True:
+            await reader.readexactly(consumed)
+            try:
+                await reader.readuntil(b'\n')
+                return None
+            except asyncio.IncompleteReadError:
+                return None
+            except asyncio.LimitOverrunError as error:
+                consumed = error.consumed
+
+    async def _write(self, writer, reply):
+        """Sends one reply line; returns None, quietly if the client has gone
+        """
+        try:
+            writer.write(json.dumps(reply).encode('utf-8') + b'\n')
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def _reply(self, line, writer):
+        """Answers one request line
+        """
+        request = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict) or 'board' not in request:
+                raise ValueError('request must be an object with a board')
+            reply = await self.solve(request['board'], request.get('deadline'))
+        except (ValueError, TypeError) as error:
+            reply = {'error': 'bad request: ' + str(error)}
+        if isinstance(request, dict) and 'id' in request:
+            reply['id'] = request['id']
+        await self._write(writer, reply)
+
+
+def main(argv=None):
+    """Serves the dictionary named on the command line until interrupted
+    """
+    parser = argparse.ArgumentParser(description='Serves word_hunt over JSON lines')
+    parser.add_argument('dictionary', help='text file of words to load')
+    parser.add_argument('--unix', metavar='PATH', help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on, defaults to localhost')
+    parser.add_argument('--port', type=int, default=8765, help='port to listen on, defaults to 8765')
+    parser.add_argument('--workers', type=int, help='number of executor threads')
+    parser.add_argument('--max-pending', type=int, default=64, help='distinct boards in flight before replying busy')
+    parser.add_argument('--deadline', type=float, default=5.0, help='default and longest deadline in seconds')
+    args = parser.parse_args(argv)
+
+    async def serve():
+        service = SolverService(args.dictionary, args.workers, args.max_pending, args.deadline)
+        server = await service.start(args.unix, args.host, args.port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            service.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+from tries import Trie
+from batch import solve_boards
+
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_solve_boards(self):
+
+        retrieval = Trie()
+        retrieval.convert_from_text('greedog.txt')
+
+        boards = [[['f','n'],
+                   ['d','i']],
+                  [['w','t','s','m'],
+                   ['i','e','a','w'],
+                   ['a','i','g','s'],
+                   ['h','k','n','e']],
+                  [['x']]]
+        expected = [sorted(retrieval.word_hunt(board)) for board in boards]
+
+        # Test results in input order
+        solution = list(solve_boards(boards, retrieval, workers = 2))
+        assert [index for index, words in solution] == [0, 1, 2]
+        assert [sorted(words) for index, words in solution] == expected
+
+        # Test results as they complete, dictionary from file
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, 'greedog.trie')
+            retrieval.save(file_name)
+            solution = solve_boards(iter(boards), file_name, workers = 2, chunksize = 2, ordered = False)
+            for index, words in solution:
+                assert sorted(words) == expected[index]
+
+        # Test empty batch
+        assert list(solve_boards([], retrieval, workers = 1)) == []
+
+
+
+if __name__ == "__main__":
+    unittest.main()
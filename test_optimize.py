@@ -0,0 +1,125 @@
+import random
+import unittest
+from tries import Alphabet, Trie, canonical_board, score_word
+from optimize import IncrementalSolver, anneal, build_gaddag, letter_weights, optimize_boards
+
+
+
+class TestOptimize(unittest.TestCase):
+
+    def test_board(self):
+
+        retrieval = Trie()
+        retrieval.convert_from_text('greedog.txt')
+        gaddag = build_gaddag(retrieval.iter_library())
+
+        # Test every path and score match word_hunt_paths, through changes and undos
+        rand = random.Random(0)
+        letters = ['a', 'e', 'i', 'o', 'r', 's', 't', 'n', 'g', 'd', 'l', 'qu']
+        for _ in range(10):
+            board = IncrementalSolver(gaddag, [[rand.choice(letters) for _ in range(4)] for _ in range(rand.randint(1, 4))])
+            for _ in range(10):
+                change = board.set_cell(rand.randrange(len(board.cells)), rand.choice(letters))
+                if rand.random() < 0.3:
+                    board.undo(change)
+                paths = retrieval.word_hunt_paths(board.matrix(), all_paths = True)
+                assert board.counts == {word: len(found) for word, (found, points) in paths.items()}
+                assert board.score == sum(points for found, points in paths.values())
+                assert sorted(board.paths_through(0)) == sorted((word, path) for path, word in board.paths.items() if 0 in path)
+
+        # Test word counting objective
+        board = IncrementalSolver(gaddag, [['w','t','s','m'],
+                                           ['i','e','a','w'],
+                                           ['a','i','g','s'],
+                                           ['h','k','n','e']], objective = 'words')
+        assert board.score == len(retrieval.word_hunt(board.matrix()))
+
+        # Test empty dictionary
+        assert IncrementalSolver(build_gaddag([]), [['a']]).counts == {}
+
+
+    def test_update_cell(self):
+
+        retrieval = Trie()
+        retrieval.convert_from_text('greedog.txt')
+        grid = [['w','t','s','m'],
+                ['i','e','a','w'],
+                ['a','i','g','s'],
+                ['h','k','n','e']]
+        solver = IncrementalSolver(retrieval, grid)
+        assert sorted(solver.words()) == sorted(retrieval.word_hunt(grid))
+
+        # Test each update matches word_hunt and word_hunt_paths on the changed board
+        rand = random.Random(1)
+        for _ in range(30):
+            y = rand.randrange(4)
+            x = rand.randrange(4)
+            letter = rand.choice('aeistgnw')
+            before = set(solver.words())
+            grid[y][x] = letter
+            lost, gained = solver.update_cell(y, x, letter)
+            expected = retrieval.word_hunt_paths(grid, all_paths = True)
+            assert solver.matrix() == grid
+            assert sorted(solver.words()) == sorted(expected)
+            assert lost == sorted(before - set(expected))
+            assert gained == sorted(set(expected) - before)
+            for word, (paths, points) in expected.items():
+                assert sorted(solver.word_paths(word)) == sorted(paths)
+
+        assert solver.word_paths('absent') == []
+        self.assertRaises(IndexError, solver.update_cell, 4, 0, 'a')
+
+        # Test tokens a GADDAG of letters can't match word_hunt with are refused
+        tokens = Trie(Alphabet(['qu']))
+        tokens.insert_word('queen')
+        assert tokens.word_hunt([['q','u','e'], ['n','e','x']]) == []
+        self.assertRaises(ValueError, IncrementalSolver, tokens, [['q','u','e'], ['n','e','x']])
+        self.assertRaises(ValueError, optimize_boards, tokens, seconds = 0.1, restarts = 1, workers = 1)
+
+
+    def test_anneal(self):
+
+        retrieval = Trie()
+        retrieval.convert_from_text('greedog.txt')
+        words = list(retrieval.iter_library())
+        gaddag = build_gaddag(words)
+        letters = letter_weights(words)
+        assert sum(letters[1]) == sum(len(word) for word in words)
+
+        # Test best board's score and word count are its own
+        score, count, board = anneal(gaddag, steps = 500, letters = letters, seed = 1)
+        found = retrieval.word_hunt(board)
+        assert len(board) == 4 and len(board[0]) == 4
+        assert count == len(found)
+        assert score == sum(score_word(word) for word in found)
+        assert score > 0
+
+        # Test seeded runs repeat, and the search beats its starting board
+        assert anneal(gaddag, steps = 500, letters = letters, seed = 1) == (score, count, board)
+        assert anneal(gaddag, steps = 0, letters = letters, seed = 1)[0] < score
+
+        score, count, board = anneal(gaddag, rows = 3, columns = 5, steps = 200, objective = 'words', seed = 2)
+        assert len(board) == 3 and len(board[0]) == 5
+        assert score == count == len(retrieval.word_hunt(board))
+
+        self.assertRaises(ValueError, anneal, gaddag, objective = 'letters')
+
+
+    def test_optimize_boards(self):
+
+        retrieval = Trie()
+        retrieval.convert_from_text('greedog.txt')
+
+        best = optimize_boards(retrieval, seconds = 0.2, restarts = 3, workers = 2, keep = 2)
+        assert 1 <= len(best) <= 2
+        assert [score for score, count, board in best] == sorted([score for score, count, board in best], reverse = True)
+        assert len(set(canonical_board(board) for score, count, board in best)) == len(best)
+        for score, count, board in best:
+            found = retrieval.word_hunt(board)
+            assert count == len(found)
+            assert score == sum(score_word(word) for word in found)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
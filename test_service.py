@@ -0,0 +1,126 @@
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import unittest
+from tries import Trie
+from service import LINE_LIMIT, SolverService
+
+
+
+class TestService(unittest.TestCase):
+
+    def setUp(self):
+        self.retrieval = Trie()
+        self.retrieval.convert_from_text('greedog.txt')
+        self.grid = [['w','t','s','m'],
+                     ['i','e','a','w'],
+                     ['a','i','g','s'],
+                     ['h','k','n','e']]
+
+    def test_solve(self):
+
+        async def run():
+            service = SolverService(self.retrieval, workers = 2, max_pending = 2)
+            try:
+                # Test results match word_hunt
+                reply = await service.solve(self.grid)
+                assert reply == {'words': sorted(self.retrieval.word_hunt(self.grid)), 'complete': True}
+
+                # Test identical boards, up to rotation, share one search running until their deadlines
+                rotated = [list(row) for row in zip(*self.grid[::-1])]
+                replies = await asyncio.gather(service.solve(self.grid), service.solve(rotated, deadline = 4),
+                                               service.solve(self.grid, deadline = 4))
+                assert all(reply == replies[0] for reply in replies)
+                assert (service.solves, service.coalesced) == (2, 2)
+
+                # Test a request never shares a search stopping before its own deadline
+                short, long = await asyncio.gather(service.solve(self.grid, deadline = 0), service.solve(self.grid))
+                assert short['complete'] == False
+                assert long == replies[0]
+                assert (service.solves, service.coalesced) == (4, 2)
+                assert service._solving == {} and service._pending == 0
+
+                # Test backpressure once max_pending distinct boards are in flight
+                boards = [[['a']], [['b']], [['d']]]
+                replies = await asyncio.gather(*[service.solve(board) for board in boards])
+                assert replies[2] == {'error': 'busy'}
+                assert service.rejected == 1
+                assert (await service.solve([['d']]))['complete'] == True
+
+                # Test deadline gives partial results
+                reply = await service.solve(self.grid, deadline = 0)
+                assert reply['complete'] == False
+                assert set(reply['words']) <= set(self.retrieval.word_hunt(self.grid))
+
+                with self.assertRaises(ValueError):
+                    await service.solve('board')
+                for deadline in (float('nan'), float('inf')):
+                    with self.assertRaises(ValueError):
+                        await service.solve(self.grid, deadline = deadline)
+            finally:
+                service.close()
+
+        asyncio.run(run())
+
+    def test_socket(self):
+
+        async def request(reader, writer, lines):
+            writer.write(''.join(line + '\n' for line in lines).encode())
+            await writer.drain()
+            replies = [json.loads(await reader.readline()) for _ in lines]
+            return {reply.get('id'): reply for reply in replies}
+
+        async def connect(server, path):
+            if path is None:
+                return await asyncio.open_connection('127.0.0.1', server.sockets[0].getsockname()[1])
+            return await asyncio.open_unix_connection(path)
+
+        async def run(path):
+            service = SolverService(self.retrieval, workers = 2)
+            server = await service.start(path = path)
+            try:
+                reader, writer = await connect(server, path)
+                replies = await request(reader, writer, [json.dumps({'id': 1, 'board': self.grid}),
+                                                         json.dumps({'id': 'two', 'board': [['x']], 'deadline': 1}),
+                                                         'not json',
+                                                         json.dumps({'id': 3, 'board': [[1]]}),
+                                                         json.dumps({'id': 4, 'board': self.grid, 'deadline': float('nan')})])
+                assert replies[1] == {'id': 1, 'words': sorted(self.retrieval.word_hunt(self.grid)), 'complete': True}
+                assert replies['two'] == {'id': 'two', 'words': [], 'complete': True}
+                assert replies[None]['error'].startswith('bad request')
+                assert replies[3]['error'].startswith('bad request')
+                assert replies[4]['error'].startswith('bad request')
+
+                # Test a line over LINE_LIMIT gets an error and requests around it still get answered
+                replies = await request(reader, writer, [json.dumps({'id': 5, 'board': [['a']]}),
+                                                         'x' * (LINE_LIMIT + 100),
+                                                         json.dumps({'id': 6, 'board': self.grid})])
+                assert replies[None] == {'error': 'bad request: line too long'}
+                assert replies[5]['complete'] == True
+                assert replies[6]['words'] == sorted(self.retrieval.word_hunt(self.grid))
+                writer.close()
+
+                # Test a client leaving before its replies doesn't stop the server
+                reader, writer = await connect(server, path)
+                writer.write(json.dumps({'id': 7, 'board': self.grid}).encode() + b'\n')
+                writer.close()
+                reader, writer = await connect(server, path)
+                assert (await request(reader, writer, [json.dumps({'id': 8, 'board': [['a']]})]))[8]['complete'] == True
+                writer.close()
+            finally:
+                server.close()
+                await server.wait_closed()
+                service.close()
+
+        # Test localhost and Unix socket
+        asyncio.run(run(None))
+        if hasattr(socket, 'AF_UNIX'):
+            with tempfile.TemporaryDirectory() as directory:
+                asyncio.run(run(os.path.join(directory, 'solver.sock')))
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,13 @@
+import bz2
+import fnmatch
+import gzip
+import itertools
+import os
+import pickle
+import tempfile
+import threading
 import unittest
-from tries import TrieNode, Trie
+from tries import Alphabet, TrieNode, Trie, CompactTrie, ConcurrentTrie, BoardIndex, BoardCache, SuffixIndex, TrieStats, canonical_board, compile_board, score_word
 
 
 
@@ -43,6 +51,19 @@ class TestTries(unittest.TestCase):
         assert child.is_leaf() == True
         assert child.get_children() == []
 
+        # Test nodes have no __dict__ and leaves share one read-only children mapping
+        assert not hasattr(node, '__dict__')
+        assert child._children is grandchild._children
+        with self.assertRaises(TypeError):
+            grandchild._children['f'] = node
+
+        # Test pickling keeps children and leaves
+        copy = pickle.loads(pickle.dumps(node))
+        assert copy.get_child('c').get_value() == 'c'
+        assert copy.get_child('c').is_leaf() == True
+        copy.get_child('c').set_child('f')
+        assert child.is_leaf() == True
+
 
     def test_insert_word(self):
 
@@ -175,6 +196,11 @@ class TestTries(unittest.TestCase):
         assert retrieval.remove_word('', root_node) == False
         assert retrieval.size == 6
 
+        # Test removing from below the root is refused, as ancestors' counts would go stale
+        self.assertRaises(ValueError, retrieval.remove_word, 'og', root_node.get_child('d'))
+        assert retrieval.size == 6 and retrieval.count_prefix('') == 6
+        assert retrieval.search_word('dog') == True
+
         # Test complete word
         assert retrieval.search_word('dog') == True
         assert retrieval.remove_word('dog', root_node) == True
@@ -200,6 +226,14 @@ class TestTries(unittest.TestCase):
         assert retrieval.remove_word('absent', root_node) == False
         assert retrieval.size == 5
 
+        # Test word with a shorter word ending along it
+        assert retrieval.remove_word('pump', root_node) == True
+        retrieval.insert_word('pu')
+        retrieval.insert_word('pump')
+        assert retrieval.remove_word('pump', root_node) == True
+        assert retrieval.search_word('pu') == True
+        assert retrieval.size == 5
+
 
     def test_get_library(self):
 
@@ -347,6 +381,740 @@ class TestTries(unittest.TestCase):
         assert len(solution) == 10
 
 
+    def test_word_hunt_cells(self):
+
+        retrieval = Trie()
+        retrieval.insert_word('queen')
+        retrieval.insert_word('quee')
+        retrieval.insert_word('en')
+        retrieval.insert_word('ne')
+
+        # Test multi-letter cells
+        grid = [['qu','e'],
+                ['n','e']]
+
+        expected = ['queen', 'quee', 'en', 'ne']
+        solution = retrieval.word_hunt(grid)
+        for word in solution:
+            assert word in expected
+        assert len(solution) == 4
+
+        # Test letters not in trie
+        grid = [['x','y'],
+                ['z','w']]
+        assert retrieval.word_hunt(grid) == []
+
+    def test_compact_trie(self):
+
+        retrieval = Trie()
+        for word in ['dog', 'do', 'dot', 'pump', 'fat', 'fire', 'hire', 'hat']:
+            retrieval.insert_word(word)
+        compact = CompactTrie.from_trie(retrieval)
+
+        # Test shared suffixes are merged
+        assert compact.size == 8
+        assert compact.node_count() < 19
+
+        # Test search_word, search_prefix
+        assert compact.search_word('') == False
+        assert compact.search_word('do') == True
+        assert compact.search_word('hire') == True
+        assert compact.search_word('hir') == False
+        assert compact.search_word('fireball') == False
+        assert compact.search_prefix('') == compact.root
+        assert compact.search_prefix('hir') != None
+        assert compact.search_prefix('snow') == None
+
+        # Test get_library, guess_word
+        solution = compact.get_library()
+        assert sorted(solution) == sorted(retrieval.get_library(retrieval.root, library = []))
+        assert sorted(compact.guess_word('do')) == ['do', 'dog', 'dot']
+        assert compact.guess_word('null') == []
+
+        # Test from_words, word_hunt
+        retrieval = Trie()
+        retrieval.convert_from_text('greedog.txt')
+        compact = CompactTrie.from_words(retrieval.get_library(retrieval.root, library = []))
+        assert compact.size == 97
+
+        grid = [['w','t','s','m'],
+                ['i','e','a','w'],
+                ['a','i','g','s'],
+                ['h','k','n','e']]
+        assert sorted(compact.word_hunt(grid)) == sorted(retrieval.word_hunt(grid))
+
+        # Test from_sorted builds the same minimal trie, skipping duplicates
+        words = sorted(retrieval.iter_library())
+        built = CompactTrie.from_sorted(words[:50] + words[49:])
+        assert built.size == 97
+        assert built.node_count() == compact.node_count()
+        assert sorted(built.get_library()) == words
+        assert sorted(built.word_hunt(grid)) == sorted(retrieval.word_hunt(grid))
+        assert CompactTrie.from_sorted(['', 'a']).search_word('') == True
+        assert CompactTrie.from_sorted([]).get_library() == []
+        self.assertRaises(ValueError, CompactTrie.from_sorted, ['dog', 'do'])
+
+    def test_save_load(self):
+
+        retrieval = Trie()
+        retrieval.convert_from_text('greedog.txt')
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, 'greedog.trie')
+            retrieval.save(file_name)
+            loaded = Trie.load(file_name)
+
+            # Test loaded trie matches original
+            assert loaded.size == retrieval.size
+            assert sorted(loaded.get_library()) == sorted(retrieval.get_library(retrieval.root, library = []))
+            assert loaded.search_word('steak') == True
+            assert loaded.search_word('steam') == False
+
+            grid = [['c','s','e','t','t','o'],
+                    ['i','y','k','t','y','k'],
+                    ['m','i','c','h','i','g'],
+                    ['t','a','t','s','n','a'],
+                    ['e','u','n','i','v','e'],
+                    ['x','y','t','i','s','r']]
+            assert sorted(loaded.word_hunt(grid)) == sorted(retrieval.word_hunt(grid))
+
+            # Test empty trie
+            Trie().save(file_name)
+            assert CompactTrie.load(file_name).get_library() == []
+
+            # Test file that isn't a trie
+            with open(file_name, 'wb') as writer:
+                writer.write(b'\0' * 64)
+            self.assertRaises(ValueError, Trie.load, file_name)
+
+            # Test truncated files, cut in the header, the arrays and the end flags
+            retrieval.save(file_name)
+            with open(file_name, 'rb') as reader:
+                data = reader.read()
+            for cut in (10, 40, len(data) // 2, len(data) - 3):
+                with open(file_name, 'wb') as writer:
+                    writer.write(data[:cut])
+                self.assertRaises(ValueError, Trie.load, file_name)
+            with open(file_name, 'wb') as writer:
+                writer.write(data + b'\0')
+            self.assertRaises(ValueError, Trie.load, file_name)
+
+    def test_iter_word_hunt(self):
+
+        retrieval = Trie()
+        retrieval.convert_from_text('greedog.txt')
+
+        grid = [['w','t','s','m'],
+                ['i','e','a','w'],
+                ['a','i','g','s'],
+                ['h','k','n','e']]
+        expected = retrieval.word_hunt(grid)
+
+        # Test every word yielded once
+        solution = list(retrieval.iter_word_hunt(grid))
+        assert sorted(solution) == sorted(expected)
+
+        # Test paths spell their words through adjacent cells
+        for word, path in retrieval.iter_word_hunt(grid, paths = True):
+            assert ''.join(grid[y][x] for x, y in path) == word
+            assert len(set(path)) == len(path)
+            for (x1, y1), (x2, y2) in zip(path, path[1:]):
+                assert max(abs(x1 - x2), abs(y1 - y2)) == 1
+
+        # Test early stop
+        assert len(list(retrieval.iter_word_hunt(grid, limit = 3))) == 3
+        assert list(retrieval.iter_word_hunt(grid, limit = 0)) == []
+        for word in retrieval.iter_word_hunt(grid, time_budget = 0):
+            assert word in expected
+
+    def test_word_hunt_paths(self):
+
+        retrieval = Trie()
+        retrieval.insert_word('at')
+        retrieval.insert_word('tea')
+        retrieval.insert_word('treat')
+
+        grid = [['t','r','e'],
+                ['x','a','t']]
+
+        # Test one path per word
+        solution = retrieval.word_hunt_paths(grid)
+        assert sorted(solution) == ['at', 'tea', 'treat']
+        assert solution['treat'] == ([((0, 0), (1, 0), (2, 0), (1, 1), (2, 1))], 2)
+        assert solution['at'][1] == 0
+        assert len(solution['at'][0]) == 1
+
+        # Test all paths
+        solution = retrieval.word_hunt_paths(grid, all_paths = True)
+        assert sorted(solution['at'][0]) == [((1, 1), (0, 0)), ((1, 1), (2, 1))]
+        assert solution['tea'][0] == [((2, 1), (2, 0), (1, 1))]
+
+        # Test custom scoring
+        solution = retrieval.word_hunt_paths(grid, scoring = len)
+        assert solution['treat'][1] == 5
+        solution = retrieval.word_hunt_paths(grid, scoring = {1: 1, 4: 10})
+        assert solution['tea'][1] == 1
+        assert solution['treat'][1] == 10
+
+        # Test score_word
+        assert score_word('') == 0
+        assert score_word('cat') == 1
+        assert score_word('boggles') == 5
+        assert score_word('unluckily') == 11
+
+    def test_board_index(self):
+
+        retrieval = Trie()
+        retrieval.convert_from_text('greedog.txt')
+        index = BoardIndex(retrieval)
+
+        grid = [['w','t','s','m'],
+                ['i','e','a','w'],
+                ['a','i','g','s'],
+                ['h','k','n','e']]
+
+        # Test candidates keep words the board holds and drop words it can't
+        candidates = index.candidates(grid)
+        for word in retrieval.word_hunt(grid):
+            assert word in candidates
+        assert 'steak' in candidates
+        assert 'dog' not in candidates          # no d or o on board
+        assert 'the' not in candidates          # t and h not side by side
+        assert 'steaks' not in candidates       # k and s not side by side
+        assert candidates == sorted(candidates)
+
+        # Test searching the pruned trie finds the same words
+        for grid in [grid, [['f','n'], ['d','i']], [['qu','e'], ['e','n']], []]:
+            assert sorted(index.prune(grid).word_hunt(grid)) == sorted(retrieval.word_hunt(grid))
+
+    def test_compile_board(self):
+
+        # Test neighbour table
+        grid = [['a','b','c'],
+                ['d','e','f']]
+        cells, coordinates, neighbors = compile_board(grid)
+        assert cells == ['a', 'b', 'c', 'd', 'e', 'f']
+        assert coordinates[4] == (1, 1)
+        assert sorted(j for j, bit in neighbors[0]) == [1, 3, 4]
+        assert sorted(j for j, bit in neighbors[4]) == [0, 1, 2, 3, 5]
+        for adjacent in neighbors:
+            for j, bit in adjacent:
+                assert bit == 1 << j
+
+        # Test ragged rows, moves can't go past the end of the current row
+        grid = [['a','t'],
+                ['t','e','a']]
+        cells, coordinates, neighbors = compile_board(grid)
+        assert sorted(j for j, bit in neighbors[1]) == [0, 2, 3]
+        assert sorted(j for j, bit in neighbors[4]) == [1, 3]
+
+        retrieval = Trie()
+        for word in ['at', 'tea', 'eat', 'ate', 'tee']:
+            retrieval.insert_word(word)
+        assert sorted(retrieval.word_hunt(grid)) == ['at', 'ate', 'eat', 'tea']
+        assert compile_board([]) == ([], [], [])
+
+    def test_convert_from_text_streaming(self):
+
+        retrieval = Trie()
+        assert retrieval.convert_from_text('greedog.txt') > 98
+        expected = sorted(retrieval.get_library(retrieval.root, library = []))
+
+        # Test words split across chunks and small batches
+        reports = []
+        streamed = Trie()
+        streamed.convert_from_text('greedog.txt', chunk_size = 5, batch_size = 10,
+                                   report = lambda read, rate: reports.append((read, rate)))
+        assert sorted(streamed.get_library(streamed.root, library = [])) == expected
+        assert streamed.size == 97
+        assert len(reports) > 1
+        assert reports[-1][0] == retrieval.convert_from_text('greedog.txt')
+
+        # Test compressed files
+        with open('greedog.txt') as reader:
+            text = reader.read()
+        with tempfile.TemporaryDirectory() as directory:
+            for opener, extension in ((gzip.open, '.gz'), (bz2.open, '.bz2')):
+                file_name = os.path.join(directory, 'greedog.txt' + extension)
+                with opener(file_name, 'wt') as writer:
+                    writer.write(text)
+                compressed = Trie()
+                compressed.convert_from_text(file_name)
+                assert sorted(compressed.get_library(compressed.root, library = [])) == expected
+
+    def test_convert_from_text_parallel(self):
+
+        def state(trie):
+            nodes = []
+            stack = [('', trie.root)]
+            while stack:
+                word, node = stack.pop()
+                nodes.append((word, node._end, node._count, node._best, node._words))
+                stack.extend((word + val, child) for val, child in node._children.items())
+            return trie.size, trie.version, sorted(nodes)
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, 'words.txt')
+            with open('greedog.txt') as reader:
+                text = reader.read()
+            with open(file_name, 'w', encoding = 'utf-8') as writer:
+                writer.write(text + ' Greedy DOG, dog queen Québec quit the tHe. a a qat qzar qu aqa aqua aqv aquz bq bqu')
+
+            # Test parallel build matches a sequential one, node for node
+            for alphabet in (None, Alphabet(['qu', 'th'], fold_accents = True)):
+                sequential = Trie(alphabet)
+                read = sequential.convert_from_text(file_name, batch_size = 10)
+                parallel = Trie(alphabet)
+                assert parallel.convert_from_text(file_name, workers = 3) == read
+                assert state(parallel) == state(sequential)
+                assert parallel.autocomplete('d', 1) == sequential.autocomplete('d', 1)
+                assert [parallel.select(k) for k in range(parallel.size)] == list(sequential.iter_library(sort = True))
+            assert parallel.search_prefix('qu').get_value() == 'qu'
+
+            # Test letters the trie already has words under are merged rather than replaced
+            sequential = Trie()
+            parallel = Trie()
+            for retrieval in (sequential, parallel):
+                retrieval.insert_many(['dog', 'dig', 'zebra'])
+            sequential.convert_from_text(file_name)
+            parallel.convert_from_text(file_name, workers = 2)
+            assert state(parallel) == state(sequential)
+
+    def test_autocomplete(self):
+
+        retrieval = Trie()
+        retrieval.convert_from_text('greedog.txt')
+
+        # Test most frequent first, ties alphabetical
+        assert retrieval.autocomplete('t', 4) == ['the', 'to', 'that', 'then']
+        assert retrieval.autocomplete('th', 3) == ['the', 'that', 'then']
+        assert retrieval.autocomplete('steak') == ['steak', 'steaks']
+        assert len(retrieval.autocomplete('')) == 10
+        assert len(retrieval.autocomplete('', 1000)) == 97
+
+        # Test prefix not in trie, no words wanted
+        assert retrieval.autocomplete('null') == []
+        assert retrieval.autocomplete('t', 0) == []
+
+        # Test counts follow insert_word and remove_word
+        for _ in range(20):
+            retrieval.insert_word('thinking')
+        assert retrieval.autocomplete('th', 2) == ['thinking', 'the']
+        retrieval.remove_word('thinking', retrieval.root)
+        assert retrieval.autocomplete('th', 2) == ['the', 'that']
+        retrieval.insert_word('thinking')
+        assert retrieval.autocomplete('thin') == ['thinking']
+
+    def test_iter_library(self):
+
+        retrieval = Trie()
+        retrieval.convert_from_text('greedog.txt')
+        root_node = retrieval.root
+
+        # Test no state kept between calls
+        assert len(retrieval.get_library(root_node)) == 97
+        assert len(retrieval.get_library(root_node)) == 97
+        assert retrieval.get_library(root_node.get_child('d'), path = ['d']) == retrieval.guess_word('d')
+
+        # Test sorted and insertion order
+        library = list(retrieval.iter_library())
+        assert library == retrieval.get_library(root_node)
+        assert list(retrieval.iter_library(sort = True)) == sorted(library)
+
+        # Test paging with a cursor
+        for sort in (False, True):
+            pages = []
+            cursor = None
+            while True:
+                page = list(itertools.islice(retrieval.iter_library(sort = sort, start_after = cursor), 10))
+                if not page:
+                    break
+                pages.extend(page)
+                cursor = page[-1]
+            assert pages == list(retrieval.iter_library(sort = sort))
+
+        # Test cursor removed from trie
+        retrieval.remove_word('peace', root_node)
+        page = list(itertools.islice(retrieval.iter_library(sort = True, start_after = 'peace'), 2))
+        assert page == ['ran', 'reaching']
+        self.assertRaises(ValueError, list, retrieval.iter_library(start_after = 'peace'))
+
+        # Test words longer than the recursion limit
+        retrieval = Trie()
+        retrieval.insert_word('a' * 5000)
+        assert retrieval.get_library(retrieval.root) == ['a' * 5000]
+
+        # Test export_text
+        retrieval = Trie()
+        retrieval.convert_from_text('greedog.txt')
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, 'words.txt')
+            retrieval.export_text(file_name)
+            with open(file_name) as reader:
+                assert reader.read().split() == sorted(library)
+
+    def test_concurrent_trie(self):
+
+        retrieval = ConcurrentTrie()
+        for word in ['dog', 'do', 'dot', 'pump']:
+            retrieval.insert_word(word)
+        assert retrieval.size == 4
+        assert retrieval.version == 4
+
+        # Test snapshots don't see later writes
+        snapshot = retrieval.snapshot()
+        retrieval.insert_word('dogs')
+        assert retrieval.remove_word('dot') == True
+        assert retrieval.remove_word('absent') == False
+        assert retrieval.search_word('dogs') == True
+        assert retrieval.search_word('dot') == False
+        assert retrieval.size == 4
+        assert snapshot.search_word('dogs') == False
+        assert snapshot.search_word('dot') == True
+        assert snapshot.size == 4
+        assert sorted(snapshot.get_library(snapshot.root)) == ['do', 'dog', 'dot', 'pump']
+
+        # Test untouched branches are shared between snapshots
+        assert retrieval.snapshot().root.get_child('p') is snapshot.root.get_child('p')
+        assert retrieval.snapshot().root.get_child('d') is not snapshot.root.get_child('d')
+
+        # Test readers always see a whole snapshot while a writer runs
+        errors = []
+        def read():
+            for _ in range(2000):
+                current = retrieval.snapshot()
+                if not current.search_word('pump') or current.size != len(current.get_library(current.root)):
+                    errors.append(current)
+        readers = [threading.Thread(target = read) for _ in range(3)]
+        for reader in readers:
+            reader.start()
+        for i in range(300):
+            retrieval.insert_word('word' + str(i % 30))
+            retrieval.remove_word('word' + str((i + 15) % 30))
+        for reader in readers:
+            reader.join()
+        assert errors == []
+
+    def test_batch_operations(self):
+
+        retrieval = Trie()
+        expected = Trie()
+        words = ['dog', 'do', 'dot', 'pump', 'fat', 'fire', 'dog', '', 'fireball']
+
+        # Test insert_many matches insert_word
+        retrieval.insert_many(words)
+        for word in words:
+            expected.insert_word(word)
+        assert retrieval.size == expected.size == 7
+        assert list(retrieval.iter_library(sort = True)) == list(expected.iter_library(sort = True))
+        assert retrieval.autocomplete('d', 2) == ['dog', 'do']
+
+        # Test contains_many keeps input order
+        assert retrieval.contains_many(['fire', 'fir', '', 'dog', 'snow', 'do']) == [True, False, False, True, False, True]
+        assert retrieval.contains_many([]) == []
+
+        # Test large batches, walked in sorted order, keep input order and repeats
+        batch = [word[:length] for word in retrieval.iter_library() for length in range(len(word) + 2)] * 250
+        assert len(batch) >= 10000
+        assert retrieval.contains_many(batch) == [retrieval.search_word(word) for word in batch]
+
+        # Test remove_many
+        assert retrieval.remove_many(['dog', 'fire', 'absent', 'dog', 'fi', '']) == 2
+        assert retrieval.size == 5
+        assert sorted(retrieval.get_library(retrieval.root)) == ['do', 'dot', 'fat', 'fireball', 'pump']
+        assert retrieval.root.get_child('d').get_child('o').get_child('g') == None
+        assert retrieval.autocomplete('d', 2) == ['do', 'dot']
+        assert retrieval.remove_many(['fireball', 'fat']) == 2
+        assert retrieval.root.get_child('f') == None
+
+        # Test ConcurrentTrie batches
+        concurrent = ConcurrentTrie()
+        concurrent.insert_many(words)
+        assert concurrent.version == 1
+        snapshot = concurrent.snapshot()
+        assert concurrent.remove_many(['dog', 'dot']) == 2
+        assert concurrent.contains_many(['dog', 'do']) == [False, True]
+        assert snapshot.contains_many(['dog', 'dot']) == [True, True]
+
+    def test_board_cache(self):
+
+        # Test rotations and reflections share a key
+        grid = [['w','t','s','m'],
+                ['i','e','a','w'],
+                ['a','i','g','s'],
+                ['h','k','n','e']]
+        rotated = [list(row) for row in zip(*grid[::-1])]
+        mirrored = [row[::-1] for row in grid]
+        assert canonical_board(grid) == canonical_board(rotated) == canonical_board(mirrored)
+        assert canonical_board(grid) != canonical_board([['w','t'], ['i','e']])
+        assert canonical_board([['a','b','c'], ['d','e','f']]) == canonical_board([['f','e','d'], ['c','b','a']])
+        assert canonical_board([['a','b'], ['c']]) == (('a', 'b'), ('c',))
+
+        retrieval = Trie()
+        retrieval.convert_from_text('greedog.txt')
+        expected = sorted(retrieval.word_hunt(grid))
+        retrieval.cache = BoardCache(maxsize = 2)
+
+        # Test hits and misses
+        assert sorted(retrieval.word_hunt(grid)) == expected
+        assert sorted(retrieval.word_hunt(rotated)) == expected
+        assert sorted(retrieval.word_hunt(mirrored)) == expected
+        assert retrieval.cache.hits == 2
+        assert retrieval.cache.misses == 1
+
+        # Test results can't be changed through the cache
+        retrieval.word_hunt(grid).append('oops')
+        assert sorted(retrieval.word_hunt(grid)) == expected
+
+        # Test least recently used board evicted
+        retrieval.word_hunt([['f','n'], ['d','i']])
+        retrieval.word_hunt([['a']])
+        assert len(retrieval.cache) == 2
+        assert retrieval.cache.evictions == 1
+        retrieval.word_hunt(grid)
+        assert retrieval.cache.misses == 4
+
+        # Test byte limit
+        retrieval.cache = BoardCache(max_bytes = 1)
+        retrieval.word_hunt(grid)
+        assert len(retrieval.cache) == 0
+        assert retrieval.cache.bytes == 0
+
+        # Test dictionary changes invalidate cache
+        retrieval.cache = BoardCache()
+        retrieval.word_hunt(grid)
+        retrieval.insert_word('steak')          # already in trie, nothing changes
+        retrieval.word_hunt(grid)
+        assert retrieval.cache.hits == 1
+        retrieval.insert_word('wet')
+        assert 'wet' in retrieval.word_hunt(grid)
+        assert retrieval.cache.invalidations == 1
+        retrieval.remove_word('wet', retrieval.root)
+        assert sorted(retrieval.word_hunt(grid)) == expected
+        assert retrieval.cache.stats()['invalidations'] == 2
+
+    def test_instrumentation(self):
+
+        retrieval = Trie()
+        for word in ['at', 'tea', 'treat', 'tree']:
+            retrieval.insert_word(word)
+
+        grid = [['t','r','e'],
+                ['x','a','t']]
+
+        # Test word_hunt counts
+        reported = []
+        stats = TrieStats(callback = reported.append)
+        assert sorted(retrieval.word_hunt(grid, stats = stats)) == sorted(retrieval.word_hunt(grid))
+        assert stats.hunts == 1
+        assert reported == [stats]
+        assert stats.hits == 5              # at twice, tea, treat twice
+        assert stats.max_depth == 5
+        assert stats.expanded > stats.hits
+        assert stats.pruned > 0
+        assert sorted(stats.cell_seconds) == [(0, 0), (0, 1), (1, 0), (1, 1), (2, 0), (2, 1)]
+        assert stats.as_dict()['cell_seconds']['2,1'] >= 0
+
+        # Test counts add up over hunts
+        expanded = stats.expanded
+        retrieval.word_hunt(grid, stats = stats)
+        assert stats.hunts == 2
+        assert stats.hits == 10
+        assert stats.expanded == 2 * expanded
+
+        # Test lookups
+        retrieval.instrument(stats)
+        retrieval.search_word('tea')
+        retrieval.search_word('te')
+        retrieval.search_prefix('tr')
+        retrieval.search_prefix('z')
+        assert (stats.word_searches, stats.words_found) == (2, 1)
+        assert (stats.prefix_searches, stats.prefixes_missed) == (2, 1)
+        retrieval.instrument(None)
+        retrieval.search_word('tea')
+        assert stats.word_searches == 2
+
+        # Test shape
+        shape = retrieval.shape()
+        assert shape['nodes'] == 11
+        assert shape['leaves'] == 4
+        assert shape['max_depth'] == 5
+        assert shape['max_fan_out'] == 2
+        assert shape['mean_fan_out'] == 10 / 7
+
+    def test_fuzzy_search(self):
+
+        def distance(word, other):
+            previous = list(range(len(other) + 1))
+            for i, letter in enumerate(word, 1):
+                row = [i]
+                for j, other_letter in enumerate(other, 1):
+                    row.append(min(row[-1] + 1, previous[j] + 1, previous[j - 1] + (letter != other_letter)))
+                previous = row
+            return previous[-1]
+
+        retrieval = Trie()
+        retrieval.convert_from_text('greedog.txt')
+        retrieval.insert_many(['greed', 'greed', 'gree'])
+
+        # Test ranking by distance, then frequency, then alphabetically
+        assert retrieval.fuzzy_search('gredy') == [('greedy', 1), ('greed', 2), ('gree', 2)]
+        assert retrieval.fuzzy_search('greedy', 0) == [('greedy', 0)]
+        assert retrieval.fuzzy_search('gredy', 2, 1) == [('greedy', 1)]
+        assert retrieval.fuzzy_search('gredy', 2, 0) == []
+
+        # Test against scanning every word
+        library = list(retrieval.iter_library())
+        for word in ['dgo', 'tea', 'snow', 'a', '', 'qwertyuiop']:
+            for max_edits in range(4):
+                for k in [None, 1, 5]:
+                    expected = sorted((distance(word, known), -retrieval.search_prefix(known)._count, known)
+                                      for known in library if distance(word, known) <= max_edits)[:k]
+                    assert retrieval.fuzzy_search(word, max_edits, k) == [(known, edits) for edits, _, known in expected]
+
+        # Test tokens count as one letter
+        tokens = Trie(Alphabet(['qu']))
+        tokens.insert_word('quit')
+        assert tokens.fuzzy_search('kit', 1) == [('quit', 1)]
+        assert ConcurrentTrie(tokens).fuzzy_search('quiet') == [('quit', 1)]
+
+    def test_match(self):
+
+        retrieval = Trie()
+        retrieval.convert_from_text('greedog.txt')
+        index = SuffixIndex(retrieval)
+        library = sorted(retrieval.iter_library())
+
+        # Test against fnmatch over every word, with and without the index
+        for pattern in ['*', '?', 'd?g', '*ed', '*e*', 'g*y', '[abc]*', '[!abc]??', '[a-d]*[!e]', '*[st]',
+                        '?*?', 'gr??d*', 'dog', 'dog*', '*o*g*', 'xyz', '**ing', '']:
+            expected = [word for word in library if fnmatch.fnmatchcase(word, pattern)]
+            assert retrieval.match(pattern) == expected
+            assert retrieval.match(pattern, index) == expected
+        assert retrieval.match('*ed', index) == ['barked', 'carried', 'dropped', 'happened', 'hunted',
+                                                 'jumped', 'managed', 'reflected', 'vanished']
+        self.assertRaises(ValueError, retrieval.match, 'd[og')
+
+        # Test tokens are single letters
+        tokens = Trie(Alphabet(['qu']))
+        tokens.insert_many(['queen', 'quit', 'aqua', 'tea'])
+        index = SuffixIndex(tokens)
+        assert tokens.match('?een') == ['queen']
+        assert tokens.match('*een', index) == ['queen']
+        assert tokens.match('*a', index) == ['aqua', 'tea']
+        assert tokens.match('qu*') == ['queen', 'quit']
+        assert tokens.match('q*') == []
+
+    def test_rank_select(self):
+
+        retrieval = Trie()
+        retrieval.convert_from_text('greedog.txt')
+        retrieval.insert_many(['qa', 'qaa', 'qab'])
+
+        def check(trie):
+            library = list(trie.iter_library(sort = True))
+            assert trie.count_prefix('') == trie.size == len(library)
+            for position, word in enumerate(library):
+                assert trie.rank(word) == position
+                assert trie.select(position) == word
+            for prefix in ['q', 'qa', 'gr', 'zz', 'greedy']:
+                under = [word for word in library if word.startswith(prefix)]
+                assert trie.count_prefix(prefix) == len(under)
+                assert [trie.select(k, prefix) for k in range(len(under))] == under
+
+        # Test counts, ranks and selections agree with sorted library, through insertions and removals
+        check(retrieval)
+        assert retrieval.select(-1) == list(retrieval.iter_library(sort = True))[-1]
+        assert retrieval.rank('a') == 0
+        assert retrieval.rank('qaaa') == retrieval.rank('qab')
+        assert retrieval.rank('zzz') == retrieval.size
+        retrieval.remove_word('qaa', retrieval.root)
+        retrieval.remove_many(['qa', 'dog', 'absent'])
+        check(retrieval)
+        retrieval.insert_word('qaa')
+        retrieval.insert_word('qaa')
+        check(retrieval)
+        assert retrieval.count_prefix('qa') == 2
+
+        self.assertRaises(IndexError, retrieval.select, retrieval.size)
+        self.assertRaises(IndexError, retrieval.select, 0, 'zz')
+
+        # Test snapshots of a concurrent trie keep their own counts
+        concurrent = ConcurrentTrie(retrieval)
+        concurrent.insert_many(['zz', 'zzz'])
+        concurrent.remove_word('qab')
+        check(concurrent.snapshot())
+        check(retrieval)
+        assert concurrent.count_prefix('zz') == 2
+        assert concurrent.select(-1) == 'zzz'
+        assert concurrent.rank('zzz') == concurrent.size - 1
+
+        # Test tokens sort as one letter
+        tokens = Trie(Alphabet(['qu']))
+        tokens.insert_many(['quit', 'qat', 'rat'])
+        assert [tokens.select(k) for k in range(3)] == list(tokens.iter_library(sort = True))
+        assert tokens.rank('rat') == 2
+        assert tokens.count_prefix('q') == 1
+
+
+    def test_alphabet(self):
+
+        # Test normalization and splitting
+        alphabet = Alphabet(['Qu', 'th'], casefold = True, fold_accents = True)
+        assert alphabet.tokens == ('qu', 'th')
+        assert alphabet.split('queen') == ['qu', 'e', 'e', 'n']
+        assert alphabet.split('dog') == 'dog'
+        assert alphabet.clean("Café's") == 'cafes'
+        assert alphabet.clean('Straße') == 'strasse'
+        assert Alphabet().clean('Straße') == 'straße'
+        assert Alphabet().clean('cafe\u0301') == 'caf\u00e9'
+        assert Alphabet().clean('\u0928\u092e\u0938\u094d\u0924\u0947') == '\u0928\u092e\u0938\u094d\u0924\u0947'   # keeps vowel signs
+
+        # Test multi-letter tokens are single edges
+        retrieval = Trie(alphabet)
+        retrieval.insert_many(['queen', 'quit', 'aqua', 'tea', 'the'])
+        assert retrieval.search_word('queen') == True
+        assert retrieval.search_prefix('qu').get_value() == 'qu'
+        assert retrieval.search_prefix('q') == None
+        assert sorted(retrieval.iter_library()) == ['aqua', 'queen', 'quit', 'tea', 'the']
+        assert retrieval.contains_many(['quit', 'qui', 'the']) == [True, False, True]
+
+        # Test word_hunt takes a tile as one step, and never splits it
+        assert retrieval.word_hunt([['qu', 'e'], ['n', 'e']]) == ['queen']
+        assert retrieval.word_hunt([['q', 'u'], ['e', 'e']]) == []
+        assert retrieval.word_hunt([['a', 'qu', 'a'], ['t', 'h', 'e']]) == ['aqua']
+        assert sorted(retrieval.word_hunt([['a', 'qu', 'a'], ['th', 'e', 'x']])) == ['aqua', 'the']
+        assert list(retrieval.iter_word_hunt([['qu', 'i', 't']], paths = True)) == [('quit', ((0, 0), (1, 0), (2, 0)))]
+
+        # Test removal and copies keep the alphabet
+        assert retrieval.remove_many(['quit']) == 1
+        assert retrieval.remove_word('aqua', retrieval.root) == True
+        assert sorted(retrieval.iter_library()) == ['queen', 'tea', 'the']
+        concurrent = ConcurrentTrie(retrieval)
+        concurrent.insert_word('quest')
+        assert concurrent.snapshot().alphabet == alphabet
+        assert concurrent.search_word('quest') == True
+        assert BoardIndex(retrieval).prune([['qu', 'e'], ['n', 'e']]).alphabet == alphabet
+
+        # Test saved files keep tokens and normalization
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, 'tokens.trie')
+            retrieval.save(file_name)
+            compact = Trie.load(file_name)
+            assert compact.alphabet == alphabet
+            assert compact.search_word('queen') == True
+            assert compact.word_hunt([['qu', 'e'], ['n', 'e']]) == ['queen']
+            assert compact.word_hunt([['q', 'u'], ['e', 'e']]) == []
+
+            # Test convert_from_text normalizes with the alphabet
+            file_name = os.path.join(directory, 'words.txt')
+            with open(file_name, 'w', encoding = 'utf-8') as writer:
+                writer.write('Québec THE\nqueen')
+            retrieval = Trie(alphabet)
+            retrieval.convert_from_text(file_name)
+            assert sorted(retrieval.iter_library()) == ['quebec', 'queen', 'the']
+            assert retrieval.search_prefix('qu').get_value() == 'qu'
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
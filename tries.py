@@ -1,9 +1,280 @@
 """Honors Project - Zach Arnold
 """
+import bz2
+import gc
+import gzip
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from heapq import heappop, heappush
+from multiprocessing import Pool
 from string import punctuation
+from types import MappingProxyType
+
+MOVES = [(-1, 1), ( 0, 1), ( 1, 1),                   # Grid of all possible moves around matrix
+         (-1, 0),          ( 1, 0),
+         (-1,-1), ( 0,-1), ( 1,-1)]
+
+BOGGLE_SCORES = {3: 1, 4: 1, 5: 2, 6: 3, 7: 5, 8: 11}   # points by word length, longer words score as the longest
+
+
+def score_word(word, scoring=BOGGLE_SCORES):
+    """Returns points word is worth
+
+    :param word: word to score
+    :type word: str
+    :param scoring: {length: points} table or a function of the word, defaults to BOGGLE_SCORES;
+        words shorter than every length in the table score 0
+    :type scoring: dict or callable, optional
+    :rtype: int
+    """
+    if callable(scoring):
+        return scoring(word)
+    length = min(len(word), max(scoring))
+    while length > 0 and length not in scoring:
+        length -= 1
+    return scoring.get(length, 0)
+
+
+def compile_board(matrix):
+    """Flattens matrix into a table of neighbours so searches don't bounds-check moves at every step
+
+    Cells are numbered row by row. As in word_hunt, a move from a cell may not go past the end of
+    that cell's row, and it must land on a cell that exists
+
+    :param matrix: matrix to compile
+    :type matrix: nested list
+    :return: (cells, coordinates, neighbors) where cells[i] is the value of cell i, coordinates[i] its
+        (x, y) and neighbors[i] a tuple of (j, 1 << j) for every cell j one move away, so a set of
+        visited cells can be kept as an int bitmask
+    :rtype: tuple
+    """
+    numbers = {}            # stores {(x, y): cell number}
+    cells = []
+    coordinates = []
+    for y in range(len(matrix)):
+        for x in range(len(matrix[y])):
+            numbers[(x, y)] = len(cells)
+            cells.append(matrix[y][x])
+            coordinates.append((x, y))
+
+    neighbors = []
+    for x, y in coordinates:
+        adjacent = []
+        for dx, dy in MOVES:
+            new_x = x + dx
+            new_y = y + dy
+            if new_x < len(matrix[y]) and (new_x, new_y) in numbers:
+                j = numbers[(new_x, new_y)]
+                adjacent.append((j, 1 << j))
+        neighbors.append(tuple(adjacent))
+    return cells, coordinates, neighbors
+
+
+def canonical_board(matrix):
+    """Returns the same hashable key for a board and all its rotations and reflections, which hold
+    the same words. Ragged boards aren't symmetric under word_hunt's moves, so they key as they are
+
+    :param matrix: matrix to key
+    :type matrix: nested list
+    :rtype: tuple
+    """
+    board = tuple(tuple(row) for row in matrix)
+    if len(set(len(row) for row in board)) > 1:
+        return board
+    boards = [board, board[::-1]]
+    if board and len(board) == len(board[0]):       # square boards also have the transposes
+        boards.append(tuple(zip(*board)))
+        boards.append(boards[-1][::-1])
+    boards += [tuple(row[::-1] for row in key) for key in boards]
+    return min(boards)
+
+
+def _shared_length(word, other):
+    """Returns length of the prefix word and other have in common
+    """
+    shared = 0
+    limit = min(len(word), len(other))
+    while shared < limit and word[shared] == other[shared]:
+        shared += 1
+    return shared
+
+
+class Alphabet:
+
+    def __init__(self, tokens=(), casefold=False, fold_accents=False):
+        """Initialization of the rules turning text into the letters trie edges are labelled with
+
+        Multi-letter tokens such as "qu" are stored as a single edge, so a "qu" tile is one lookup and a
+        word like "queen" is only found through it, as with a real Boggle die. Words are split into
+        tokens greedily, longest token first. Edge labels are interned, so every node labelled with the
+        same letter shares one string however large the alphabet
+
+        :param tokens: multi-letter tokens, normalized like words, defaults to none
+        :type tokens: iterable, optional
+        :param casefold: use Unicode case folding (e.g. "ß" as "ss") instead of lowercasing, defaults to False
+        :type casefold: bool, optional
+        :param fold_accents: strip accents and other combining marks (e.g. "é" as "e"), defaults to False
+        :type fold_accents: bool, optional
+        """
+        self.casefold = casefold
+        self.fold_accents = fold_accents
+        self.tokens = tuple(sorted(set(sys.intern(self.normalize(token)) for token in tokens if len(token) > 1)))
+        self._starts = {}       # stores {first letter: tokens starting with it, longest first}
+        for token in sorted(self.tokens, key=len, reverse=True):
+            self._starts.setdefault(token[0], []).append(token)
+
+    def __repr__(self):
+        """Returns string representation of alphabet; for use in debugging
+        """
+        return 'Alphabet(tokens=%r, casefold=%r, fold_accents=%r)' % (self.tokens, self.casefold, self.fold_accents)
+
+    def __eq__(self, other):
+        return isinstance(other, Alphabet) and (self.tokens, self.casefold, self.fold_accents) == \
+            (other.tokens, other.casefold, other.fold_accents)
+
+    def __hash__(self):
+        return hash((self.tokens, self.casefold, self.fold_accents))
+
+    def normalize(self, text):
+        """Returns text lowercased or case folded, composed to NFC or with its accents stripped
+
+        :param text: text to normalize
+        :type text: str
+        :rtype: str
+        """
+        if text.isascii():
+            return text.lower()
+        text = text.casefold() if self.casefold else text.lower()
+        if self.fold_accents:
+            return ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+        return unicodedata.normalize('NFC', text)
+
+    def clean(self, word):
+        """Returns word from a text file as stored in the trie: normalized, with everything but letters
+        and the marks attached to them removed
+
+        :param word: word to clean
+        :type word: str
+        :rtype: str
+        """
+        if not word.isalpha():
+            word = ''.join(c for c in word if c.isalpha() or unicodedata.category(c)[0] == 'M')
+        return self.normalize(word)
+
+    def split(self, word):
+        """Returns the tokens spelling word, each of which is one trie edge
+
+        :param word: word to split
+        :type word: str
+        :return: word itself when every letter is its own token, otherwise a list of tokens
+        :rtype: str or list
+        """
+        starts = self._starts
+        if not starts or starts.keys().isdisjoint(word):
+            return word
+        tokens = []
+        i = 0
+        while i < len(word):
+            for token in starts.get(word[i], ()):
+                if word.startswith(token, i):
+                    break
+            else:
+                token = word[i]
+            tokens.append(token)
+            i += len(token)
+        return tokens
+
+    def flags(self):
+        """Returns normalization options packed into an int, for storing in a trie file
+        """
+        return self.casefold | self.fold_accents << 1
+
+    @classmethod
+    def from_labels(cls, labels, flags=0):
+        """Returns alphabet of a trie file from its edge labels and the value of flags
+
+        :param labels: every edge label of the trie
+        :type labels: iterable
+        :param flags: value returned by flags, defaults to 0
+        :type flags: int, optional
+        :rtype: Alphabet
+        """
+        return cls([label for label in labels if len(label) > 1], bool(flags & 1), bool(flags & 2))
+
+
+DEFAULT_ALPHABET = Alphabet()      # single letters, lowercased; words are stored as they are spelled
+
+
+def _parse_pattern(pattern, alphabet):
+    """Returns pattern as a list of (kind, value) elements for Trie.match
+
+    Kinds are '*' (any run of tokens), '?' (any one token), '=' (the token in value) and '[' (any one
+    letter in value[0], or when value[1] is True any letter not in it)
+
+    :param pattern: pattern to parse
+    :type pattern: str
+    :param alphabet: alphabet splitting the literal parts of pattern into tokens
+    :type alphabet: Alphabet
+    :raises ValueError: if a [ is never closed
+    :rtype: list
+    """
+    elements = []
+    literal = ''
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char not in '*?[':
+            literal += char
+            i += 1
+            continue
+        elements.extend(('=', token) for token in alphabet.split(literal))
+        literal = ''
+        if char == '[':
+            end = pattern.find(']', i + 2)     # a ] straight after [ is a member
+            if end < 0:
+                raise ValueError('unclosed [ in pattern ' + repr(pattern))
+            members = pattern[i + 1:end]
+            negated = members[:1] in ('!', '^') and len(members) > 1
+            if negated:
+                members = members[1:]
+            letters = set()
+            j = 0
+            while j < len(members):
+                if j + 2 < len(members) and members[j + 1] == '-':     # range such as a-z
+                    letters.update(chr(code) for code in range(ord(members[j]), ord(members[j + 2]) + 1))
+                    j += 3
+                else:
+                    letters.add(members[j])
+                    j += 1
+            elements.append(('[', (frozenset(letters), negated)))
+            i = end + 1
+        else:
+            if char != '*' or not elements or elements[-1][0] != '*':     # ** is the same as *
+                elements.append((char, None))
+            i += 1
+    elements.extend(('=', token) for token in alphabet.split(literal))
+    return elements
+
+
+FILE_MAGIC = b'TRIE'
+FILE_VERSION = 1
+FILE_HEADER = struct.Struct('<4sHHIIIII')   # magic, version, alphabet flags, label bytes, nodes, edges, root, size
+
+NO_CHILDREN = MappingProxyType({})     # shared read-only children of every leaf, replaced on first set_child
+
 
 class TrieNode:
 
+    __slots__ = ('_val', '_end', '_children', '_count', '_best', '_words')
+
     def __init__(self, val, end=False):
         """Initialization of a node
         
@@ -14,17 +285,31 @@ class TrieNode:
         """
         self._val = val
         self._end = end
-        self._children = {}     # stores children in pairs of {val: node}
+        self._children = NO_CHILDREN    # stores children in pairs of {val: node}, a dict once there are any
+        self._count = 0         # times the word ending here was inserted
+        self._best = 0          # highest _count of any word in this subtree, used by autocomplete
+        self._words = 0         # number of words ending in this subtree, this node included
 
     def __repr__(self):
         """Returns string representation of node for debugging
         """
         return '\n~Node (' + str(self._val) + ') has ' + str(len(self._children)) + ' children: ' + str(sorted([val for val in self._children])) + '~'
 
+    def __getstate__(self):
+        """Returns node's fields for pickling, with leaves' shared children left out
+        """
+        return (self._val, self._end, self._children if self._children else None, self._count, self._best, self._words)
+
+    def __setstate__(self, state):
+        """Restores node's fields from __getstate__; returns None
+        """
+        self._val, self._end, children, self._count, self._best, self._words = state
+        self._children = NO_CHILDREN if children is None else children
+
     def is_leaf(self):
         """Returns whether or not TrieNode is a leaf node
         """
-        return len(self._children) == 0
+        return not self._children
 
     def get_value(self):
         """Returns value of TrieNode
@@ -32,14 +317,19 @@ class TrieNode:
         return self._val
 
     def set_child(self, val, end=False):
-        """Creates and adds child to TrieNode
+        """Creates and adds child to TrieNode, returns the child
         
-        :param val: value stored at node to create
+        :param val: value stored at node to create, interned so equal values share one string
         :type val: str
         :param end: flag signifying if node is at end of word, defaults to False
         :type end: bool, optional
+        :rtype: TrieNode
         """
-        self._children[val] = TrieNode(val, end)
+        if self._children is NO_CHILDREN:
+            self._children = {}
+        val = sys.intern(val)
+        child = self._children[val] = TrieNode(val, end)
+        return child
 
     def get_child(self, val):
         """Returns child node with given value, returns None if doesn't exist
@@ -47,8 +337,7 @@ class TrieNode:
         :param val: value of child to return
         :type val: TrieNode
         """
-        if val in self._children:
-            return self._children[val]
+        return self._children.get(val)
 
     def get_children(self):
         """Returns list of nodes representing self's children
@@ -62,6 +351,8 @@ class TrieNode:
         :type val: TrieNode
         """
         del self._children[val]
+        if not self._children:
+            self._children = NO_CHILDREN
         return val
 
     def set_end(self, on = True):
@@ -76,18 +367,104 @@ class TrieNode:
 
 
 
+_builder_alphabet = None     # alphabet shards are built with, set once per worker process by _init_builder
+
+
+def _init_builder(alphabet):
+    """Pool initializer for parallel convert_from_text
+
+    :param alphabet: alphabet of the trie being built
+    :type alphabet: Alphabet
+    """
+    global _builder_alphabet
+    _builder_alphabet = alphabet
+
+
+def _build_shard(task):
+    """Flattens one (first letter, sorted words, counts) shard in a worker, see _flatten_sorted
+    """
+    letter, words, counts = task
+    return _flatten_sorted(words, counts, _builder_alphabet)
+
+
+def _flatten_sorted(words, counts, alphabet):
+    """Returns the trie holding sorted words as flat arrays, without creating any nodes, for
+    sending between processes far faster than pickling nodes; see Trie._graft
+
+    Nodes are listed in preorder with children in the order words reach them, starting with a
+    root whose label is ''. Each node's best and words fields are filled in once its last
+    descendant has been listed
+
+    :param words: distinct non-empty words, sorted; re-sorted by their tokens when the alphabet has any
+    :type words: list
+    :param counts: times each word was seen, in the same order
+    :type counts: sequence
+    :param alphabet: how words are split into edges
+    :type alphabet: Alphabet
+    :return: (labels, label of each node as index into labels, end flags, counts, bests, words, child counts)
+    :rtype: tuple
+    """
+    labels = {'': 0}    # stores {label: index}
+    indexes = array('I', [0])
+    ends = bytearray(1)
+    totals = array('q', [0])    # counts of the words ending at each node
+    bests = array('q', [0])
+    sizes = array('q', [0])     # words ending in each node's subtree
+    degrees = array('I', [0])
+    if alphabet.tokens:     # string order can part words sharing tokens: aqa < aqua < aqv splits a-q with 'qu'
+        split_words = sorted(zip([list(alphabet.split(word)) for word in words], counts))
+    else:                   # every letter is its own token, so string order is token order
+        split_words = zip(words, counts)
+    path = [0]          # nodes along previous word, path[i] is reached after i tokens
+    previous = ''
+    for letters, count in split_words:
+        shared = _shared_length(letters, previous)
+        while len(path) > shared + 1:           # previous word's nodes past the shared prefix are done
+            done = path.pop()
+            sizes[path[-1]] += sizes[done]
+            if bests[done] > bests[path[-1]]:
+                bests[path[-1]] = bests[done]
+        for letter in letters[shared:]:
+            degrees[path[-1]] += 1
+            path.append(len(ends))
+            indexes.append(labels.setdefault(letter, len(labels)))
+            ends.append(0)
+            totals.append(0)
+            bests.append(0)
+            sizes.append(0)
+            degrees.append(0)
+        end = path[-1]
+        ends[end] = 1
+        totals[end] = count
+        bests[end] = max(bests[end], count)
+        sizes[end] += 1
+        previous = letters
+    while len(path) > 1:
+        done = path.pop()
+        sizes[path[-1]] += sizes[done]
+        if bests[done] > bests[path[-1]]:
+            bests[path[-1]] = bests[done]
+    return list(labels), indexes, bytes(ends), totals, bests, sizes, degrees
+
+
 class Trie:
 
-    def __init__(self):
+    def __init__(self, alphabet=None):
         """Initialization of Trie data structure
+
+        :param alphabet: how words are cleaned and split into edges, defaults to DEFAULT_ALPHABET
+        :type alphabet: Alphabet, optional
         """
+        self.alphabet = alphabet or DEFAULT_ALPHABET
         self.root = TrieNode('*')
         self.size = 0
+        self.version = 0        # changes whenever a word is added or removed
+        self.cache = None       # BoardCache used by word_hunt, if any
     
     def __repr__(self):
         """Returns string representation of trie; for use in debugging
         """
-        return '\nSize: ' + str(self.size) + '\nLibrary: ' + str(self.get_library(self.root, library = []))
+        return '\nSize: ' + str(self.size) + '\nLibrary: [' + ', '.join(map(repr, self.iter_library())) + ']'
 
     def is_empty(self):
         """Returns whether or not trie is empty
@@ -102,16 +479,176 @@ class Trie:
         """
         if word:
             current = self.root
-            for letter in word:
+            nodes = [current]
+            for letter in self.alphabet.split(word):
                 
-                if not current.get_child(letter):      # if letter is not a child of current node
-                    current.set_child(letter)             # add letter as a child
+                child = current.get_child(letter)
+                if child is None:               # if letter is not a child of current node
+                    child = current.set_child(letter)     # add letter as a child
 
-                current = current.get_child(letter)
+                current = child
+                nodes.append(current)
             
             if not current.get_end():
                 current.set_end()       # set last letter of word to end if word not already in trie
                 self.size += 1
+                self.version += 1
+                for node in nodes:
+                    node._words += 1
+            self._count_word(nodes, 1)
+
+    def _count_word(self, nodes, count):
+        """Adds count to the frequency of the word ending at nodes[-1]; returns None
+
+        :param nodes: nodes along the word, starting at the root
+        :type nodes: list
+        :param count: number of times word was seen
+        :type count: int
+        """
+        total = nodes[-1]._count = nodes[-1]._count + count
+        for node in reversed(nodes):
+            if node._best >= total:     # ancestors' _best is never lower than a descendant's
+                break
+            node._best = total
+
+    def _insert_sorted(self, words, counts=None):
+        """Inserts words, resuming each walk from the prefix shared with the previous word; returns None
+
+        Works for words in any order but only saves work when they are sorted. Garbage collection
+        is paused meanwhile, since creating this many nodes would otherwise trigger it over and
+        over for nothing
+
+        :param words: words to add into library
+        :type words: iterable
+        :param counts: number of times each word was seen, defaults to once each
+        :type counts: dict, optional
+        """
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            self._insert_walks(words, counts)
+        finally:
+            if collecting:
+                gc.enable()
+
+    def _insert_walks(self, words, counts):
+        """Does the inserting for _insert_sorted with garbage collection paused
+        """
+        split = self.alphabet.split
+        nodes = [self.root]         # nodes along previous word, nodes[i] is reached after i tokens
+        previous = ''
+        for word in words:
+            if not word:
+                continue
+            letters = split(word)
+            del nodes[_shared_length(letters, previous) + 1:]
+
+            current = nodes[-1]
+            for letter in letters[len(nodes) - 1:]:
+                child = current._children.get(letter)
+                if child is None:
+                    child = current.set_child(letter)
+                nodes.append(child)
+                current = child
+
+            if not current._end:
+                current._end = True
+                self.size += 1
+                self.version += 1
+                for node in nodes:
+                    node._words += 1
+            self._count_word(nodes, counts[word] if counts else 1)
+            previous = letters
+
+    def insert_many(self, words):
+        """Inserts every word in words, walking shared prefixes once; returns None
+
+        :param words: words to add into library, repeats count towards autocomplete frequency
+        :type words: iterable
+        """
+        counts = Counter(words)
+        self._insert_sorted(sorted(counts), counts)
+
+    def remove_many(self, words):
+        """Removes every word in words that is in trie, walking shared prefixes once
+
+        :param words: words to remove
+        :type words: iterable
+        :return: number of words removed
+        :rtype: int
+        """
+        removed = 0
+        nodes = [self.root]         # nodes along previous word, nodes[i] is reached after i tokens
+        previous = ''
+        for word in sorted(set(words)):
+            letters = self.alphabet.split(word)
+            del nodes[_shared_length(letters, previous) + 1:]
+            current = nodes[-1]
+            for letter in letters[len(nodes) - 1:]:
+                current = current._children.get(letter)
+                if current is None:
+                    break
+                nodes.append(current)
+            previous = letters
+
+            if current is None or not current._end or not word:
+                continue
+            current._end = False
+            count = current._count
+            current._count = 0
+            self.size -= 1
+            removed += 1
+            self.version += 1
+            for node in nodes:
+                node._words -= 1
+
+            while len(nodes) > 1 and nodes[-1].is_leaf() and not nodes[-1]._end:    # prune dead branch
+                nodes[-2].delete_child(nodes.pop()._val)
+            for node in reversed(nodes):
+                if node._best > count:  # removed word wasn't the most frequent here or above
+                    break
+                node._best = max([node._count] + [child._best for child in node._children.values()])
+            previous = letters[:len(nodes) - 1]
+        return removed
+
+    def contains_many(self, words):
+        """Searches trie for every word in words
+
+        Each word is walked from the root, which in Python beats resuming from a shared prefix.
+        Batches of at least a quarter of the trie are walked in sorted order, since neighbouring
+        words then touch nodes still in the CPU cache; smaller ones aren't worth sorting
+
+        :param words: words to search for
+        :type words: list
+        :return: list of whether each word is in trie, in the same order as words
+        :rtype: list
+        """
+        split = self.alphabet.split
+        root = self.root
+        if len(words) < max(self.size // 4, 10000):
+            found = []
+            append = found.append
+            for word in words:
+                current = root
+                for letter in split(word):
+                    current = current._children.get(letter)
+                    if current is None:
+                        break
+                append(current is not None and current._end)
+            return found
+
+        known = set()       # stores words found, walked in sorted order
+        add = known.add
+        for word in sorted(set(words)):
+            current = root
+            for letter in split(word):
+                current = current._children.get(letter)
+                if current is None:
+                    break
+            else:
+                if current._end:
+                    add(word)
+        return [word in known for word in words]
 
     def search_word(self, word):
         """Searches trie to find param word
@@ -120,7 +657,7 @@ class Trie:
         :type word: str
         """
         current = self.root
-        for letter in word:
+        for letter in self.alphabet.split(word):
             
             current = current.get_child(letter)         # node is not next letter in word
 
@@ -140,7 +677,7 @@ class Trie:
         :rtype: TrieNode
         """
         current = self.root
-        for letter in prefix:
+        for letter in self.alphabet.split(prefix):
 
             current = current.get_child(letter)
 
@@ -149,73 +686,414 @@ class Trie:
 
         return current
 
-    def remove_word(self, word, root, depth = 0):
+    def remove_word(self, word, root, depth = 0, letters = None):
         """Recursively removes word from trie if in trie; returns None
         
         :param word: word to remove
         :type word: str
-        :param root: node to begin search for word at
+        :param root: node to begin search for word at, the trie's root except within the recursion
         :type root: TrieNode
+        :param letters: word split by the alphabet, passed down by the recursion so it's split once
+        :type letters: list, optional
+        :raises ValueError: if called with a node other than the trie's root, whose ancestors' word
+            counts, frequencies and the trie's size it couldn't keep up to date
         """
         found = False
-        if depth == len(word):
+        if letters is None:
+            if root is not self.root:
+                raise ValueError('remove_word must start at the trie\'s root')
+            letters = self.alphabet.split(word)
+        if depth == len(letters):
             if root.get_end():      
                 root.set_end(False)
+                root._count = 0
+                root._words -= 1
+                root._best = max([0] + [node._best for node in root.get_children()])
                 self.size -= 1
+                self.version += 1
                 return True         # Returns true if word is found
             
             return False            # Returns false if word is a prefix        
         
-        child = root.get_child(word[depth])
+        child = root.get_child(letters[depth])
         if child:
-            found = self.remove_word(word, child, depth + 1)  
+            found = self.remove_word(word, child, depth + 1, letters)
             
-            if found and child.is_leaf():
+            if found and child.is_leaf() and not child.get_end():     # keep shorter words ending here
                 root.delete_child(child.get_value())
+            if found:
+                root._best = max([root._count] + [node._best for node in root.get_children()])
+                root._words -= 1
 
         return found
         
-    def get_library(self, root, path = [], library = []):
-        """Recursively traverses trie and returns list of known words
+    def count_prefix(self, prefix):
+        """Returns number of known words starting with prefix, in time proportional to its length
+
+        :param prefix: prefix to count words of
+        :type prefix: str
+        :rtype: int
+        """
+        current = self.search_prefix(prefix)
+        return current._words if current is not None else 0
+
+    def rank(self, word):
+        """Returns number of known words before word in iter_library(sort=True) order, i.e. word's
+        position if it is known, otherwise where it would go. Takes time proportional to its length
+
+        :param word: word to rank
+        :type word: str
+        :rtype: int
+        """
+        position = 0
+        current = self.root
+        for letter in self.alphabet.split(word):
+            if current._end:            # shorter words along the way come first
+                position += 1
+            for val, child in current._children.items():
+                if val < letter:
+                    position += child._words
+            current = current._children.get(letter)
+            if current is None:
+                break
+        return position
+
+    def select(self, k, prefix=''):
+        """Returns the word at position k of iter_library(sort=True) order, counting only words
+        starting with prefix; takes time proportional to the word's length
+
+        :param k: position of word, from 0; negative positions count back from the end
+        :type k: int
+        :param prefix: prefix the words counted start with, defaults to ''
+        :type prefix: str, optional
+        :raises IndexError: if there are not more than k such words
+        :rtype: str
+        """
+        current = self.search_prefix(prefix)
+        words = current._words if current is not None else 0
+        if k < 0:
+            k += words
+        if not 0 <= k < words:
+            raise IndexError('no word at position ' + str(k) + ' under "' + prefix + '"')
+
+        word = prefix
+        while True:
+            if current._end:
+                if k == 0:
+                    return word
+                k -= 1
+            for val, child in sorted(current._children.items()):
+                if k < child._words:
+                    word += val
+                    current = child
+                    break
+                k -= child._words
+
+    def get_library(self, root, path = None, library = None):
+        """Traverses trie and returns list of known words
         
         :param root: Node to begin searching words from
         :type root: TrieNode
-        :param path: keeps track of nodes traversed from root, defaults to []
+        :param path: letters leading from the trie's root to root, added in front of each word, defaults to None
         :type path: list, optional
-        :param library: keeps track of words found in trie, defaults to []
+        :param library: list to add words found in trie to, defaults to a new list
         :type library: list, optional
         :return: list of known words
         :rtype: list
         """
-        if root.get_end():
-            library.append("".join(path))
+        if library is None:
+            library = []
+        library.extend(self.iter_library(root, ''.join(path or [])))
+        return library
 
-        if root.is_leaf():
-            return library
+    def iter_library(self, root=None, prefix='', sort=False, start_after=None):
+        """Generator yielding known words one at a time, parents before children
 
-        for child in root.get_children():
-            path.append(child.get_value())
-            library = self.get_library(child, path, library)
-            path.pop()
+        Uses an explicit stack rather than recursion, so word length isn't bounded by the recursion
+        limit. The trie must not change while the generator is in use
 
-        return library
+        :param root: node to begin searching words from, defaults to the trie's root
+        :type root: TrieNode, optional
+        :param prefix: letters leading to root, added in front of each word, defaults to ''
+        :type prefix: str, optional
+        :param sort: visit children alphabetically rather than in insertion order, defaults to False
+        :type sort: bool, optional
+        :param start_after: a word yielded by an earlier call with the same arguments; resume right after it,
+            for paging through the library. With sort it need not still be in the trie
+        :type start_after: str, optional
+        :return: generator of words
+        :rtype: generator
+        """
+        def children(node):
+            return iter(sorted(node._children.items())) if sort else iter(node._children.items())
+
+        if root is None:
+            root = self.root
+        stack = [(prefix, children(root))]      # stores (word so far, children left to visit)
+
+        if start_after is None:
+            if root._end:
+                yield prefix
+        else:
+            if not start_after.startswith(prefix):
+                raise ValueError('"' + start_after + '" does not start with "' + prefix + '"')
+            stack = []
+            node = root
+            word = prefix
+            for letter in self.alphabet.split(start_after[len(prefix):]):
+                items = sorted(node._children.items()) if sort else list(node._children.items())
+                keys = [val for val, _ in items]
+                if letter in node._children:
+                    position = keys.index(letter) if not sort else bisect_left(keys, letter)
+                elif sort:                      # word was removed, carry on from where it would be
+                    stack.append((word, iter(items[bisect_left(keys, letter):])))
+                    node = None
+                    break
+                else:
+                    raise ValueError('"' + start_after + '" is not in trie')
+                stack.append((word, iter(items[position + 1:])))
+                node = node._children[letter]
+                word += letter
+            if node is not None:
+                stack.append((word, children(node)))
+
+        while stack:
+            word, remaining = stack[-1]
+            for val, child in remaining:
+                if child._end:
+                    yield word + val
+                stack.append((word + val, children(child)))
+                break
+            else:
+                stack.pop()
+
+    def export_text(self, file_name, sort=True):
+        """Writes every known word to a text file, one per line, without building a list of them; returns None
 
-    def convert_from_text(self, file_name):
+        :param file_name: file to write
+        :type file_name: str
+        :param sort: write words alphabetically, defaults to True
+        :type sort: bool, optional
+        """
+        with open(file_name, 'w') as writer:
+            for word in self.iter_library(sort=sort):
+                writer.write(word + '\n')
+
+    def instrument(self, stats):
+        """Counts calls to search_word and search_prefix in stats, or stops counting when stats is None;
+        returns None. The counting versions are set on this trie only, so uninstrumented tries are untouched
+
+        :param stats: object to count lookups in
+        :type stats: TrieStats
+        """
+        for name in ('search_word', 'search_prefix'):
+            self.__dict__.pop(name, None)
+        if stats is None:
+            return
+        search_word = self.search_word
+        search_prefix = self.search_prefix
+
+        def counted_search_word(word):
+            found = search_word(word)
+            stats.word_searches += 1
+            stats.words_found += found
+            return found
+
+        def counted_search_prefix(prefix):
+            node = search_prefix(prefix)
+            stats.prefix_searches += 1
+            stats.prefixes_missed += node is None
+            return node
+
+        self.search_word = counted_search_word
+        self.search_prefix = counted_search_prefix
+
+    def shape(self):
+        """Returns dict describing the trie: number of nodes and leaves, deepest word and how many
+        children nodes have on average (counting only nodes with children) and at most
+        """
+        nodes = leaves = depth = branches = widest = 0
+        stack = [(self.root, 0)]
+        while stack:
+            node, level = stack.pop()
+            nodes += 1
+            depth = max(depth, level)
+            if node._children:
+                branches += 1
+                widest = max(widest, len(node._children))
+                stack.extend((child, level + 1) for child in node._children.values())
+            else:
+                leaves += 1
+        return {'nodes': nodes, 'leaves': leaves, 'max_depth': depth, 'max_fan_out': widest,
+                'mean_fan_out': (nodes - 1) / branches if branches else 0}
+
+    def convert_from_text(self, file_name, chunk_size=1 << 20, batch_size=100000, report=None, workers=1):
         """Converts contents of a .txt file into the trie
-        
+
+        The file is read chunk_size characters at a time and words are inserted in sorted batches of
+        up to batch_size distinct words, so memory stays bounded however large the file is. Files
+        ending in .gz or .bz2 are decompressed as they are read. How often each word appears is
+        kept for autocomplete
+
+        With more than one worker, words are instead sharded by their first letter, each shard's
+        nodes are laid out by a worker process and then grafted under the root. Every distinct word
+        is then held until the whole file is read. Letters the trie already has words under are
+        inserted in this process
+
         :param file_name: file to add contents into trie
         :type file_name: .txt file
+        :param chunk_size: number of characters to read at a time, defaults to 1 << 20
+        :type chunk_size: int, optional
+        :param batch_size: number of distinct words to collect before inserting, defaults to 100000
+        :type batch_size: int, optional
+        :param report: called with (words read so far, words read per second) after each batch
+        :type report: callable, optional
+        :param workers: number of processes to build with, None for os.cpu_count(), defaults to 1
+        :type workers: int, optional
+        :return: number of words read
+        :rtype: int
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers <= 1:
+            read = 0
+            for read, counts in self._read_batches(file_name, chunk_size, batch_size, report):
+                self._insert_sorted(sorted(counts), counts)
+            return read
+
+        read = 0
+        counts = Counter()
+        for read, batch in self._read_batches(file_name, chunk_size, batch_size, report):
+            counts.update(batch)
+        counts.pop('', None)
+
+        shards = {}         # stores {first letter: (its words sorted, their counts)}
+        split = self.alphabet.split
+        for word in sorted(counts):
+            letter = split(word)[0]
+            shard = shards.get(letter)
+            if shard is None:
+                shard = shards[letter] = ([], array('q'))
+            shard[0].append(word)
+            shard[1].append(counts[word])
+        del counts
+
+        tasks = []
+        for letter, (words, numbers) in shards.items():
+            if letter in self.root._children:
+                self._insert_sorted(words, dict(zip(words, numbers)))
+            else:
+                tasks.append((letter, words, numbers))
+        if tasks:
+            tasks.sort(key=lambda task: len(task[1]), reverse=True)     # largest first
+            with Pool(min(workers, len(tasks)), initializer=_init_builder, initargs=(self.alphabet,)) as pool:
+                for flat in pool.imap_unordered(_build_shard, tasks):
+                    self._graft(flat)
+        return read
+
+    def _read_batches(self, file_name, chunk_size, batch_size, report):
+        """Generator yielding (words read so far, Counter of cleaned words) for each batch of
+        convert_from_text, calling report once the batch has been used
         """
-        with open(file_name, 'r') as reader:
-            words_list = []
-            for line in reader:
-                words_list.extend(line.split())
+        opener = {'.gz': gzip.open, '.bz2': bz2.open}.get(os.path.splitext(file_name)[1], open)
+        start = time.perf_counter()
+        read = 0
+        batch = Counter()
+        with opener(file_name, 'rt') as reader:
+            partial = ''
+            while True:
+                chunk = reader.read(chunk_size)
+                words = (partial + chunk).split()
+                partial = words.pop() if chunk and words and not chunk[-1].isspace() else ''  # word may go on
+                read += len(words)
+                batch.update(words)
+
+                if len(batch) >= batch_size or not chunk:
+                    counts = Counter()
+                    for word, count in batch.items():
+                        counts[self._clean(word)] += count
+                    yield read, counts
+                    batch.clear()
+                    if report:
+                        report(read, read / max(time.perf_counter() - start, 1e-9))
+                if not chunk:
+                    return
+
+    def _graft(self, flat):
+        """Rebuilds nodes from _flatten_sorted under the root; returns None
+
+        Garbage collection is paused meanwhile, since creating this many nodes would otherwise
+        trigger it over and over for nothing
 
-            for word in set(words_list):
-                if word.isalpha():
-                    self.insert_word(word.lower())
+        :param flat: nodes none of whose first letters are children of the root yet
+        :type flat: tuple
+        """
+        labels, indexes, ends, counts, bests, words, degrees = flat
+        labels = [sys.intern(label) for label in labels]
+        new = TrieNode.__new__
+        children = self.root._children if self.root._children else {}
+        parents = [children]        # children of each node along the current word
+        remaining = [degrees[0]]    # children still to come for each of parents
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            for index, end, count, best, total, degree in zip(indexes[1:], ends[1:], counts[1:], bests[1:],
+                                                              words[1:], degrees[1:]):   # root is already parents[0]
+                node = new(TrieNode)
+                val = node._val = labels[index]
+                node._end = end == 1
+                node._count = count
+                node._best = best
+                node._words = total
+                children[val] = node
+                remaining[-1] -= 1
+                if degree:
+                    children = node._children = {}
+                    parents.append(children)
+                    remaining.append(degree)
                 else:
-                    self.insert_word(''.join([c for c in word if c.isalpha()]).lower())
+                    node._children = NO_CHILDREN
+                    while len(remaining) > 1 and not remaining[-1]:
+                        remaining.pop()
+                        parents.pop()
+                    children = parents[-1]
+        finally:
+            if collecting:
+                gc.enable()
+
+        self.root._children = parents[0]
+        self.root._words += words[0]
+        self.root._best = max(self.root._best, bests[0])
+        self.size += words[0]
+        self.version += words[0]
+
+    def _clean(self, word):
+        """Returns word from a text file as stored in the trie, see Alphabet.clean
+
+        :param word: word to clean
+        :type word: str
+        :rtype: str
+        """
+        return self.alphabet.clean(word)
+
+    def save(self, file_name):
+        """Writes trie to a binary file that CompactTrie.load (or Trie.load) can map in place; returns None
+
+        :param file_name: file to write
+        :type file_name: str
+        """
+        CompactTrie.from_trie(self).save(file_name)
+
+    @staticmethod
+    def load(file_name):
+        """Maps a file written by save into memory without rebuilding the trie
+
+        :param file_name: file to read
+        :type file_name: str
+        :return: read-only trie answering queries straight from the mapped file
+        :rtype: CompactTrie
+        """
+        return CompactTrie.load(file_name)
 
     def guess_word(self, prefix):
         """Returns a list of all words that word could extend into
@@ -223,7 +1101,7 @@ class Trie:
         :param prefix: prefix string to perform guess on
         :type prefix: str
         """
-        prefix = prefix.lower()
+        prefix = self.alphabet.normalize(prefix)
         current = self.search_prefix(prefix)
         if current:
             print("You typed: " + '"' + prefix + '"')
@@ -231,64 +1109,1158 @@ class Trie:
                 print('"' + prefix + '" is a word, but you could have also been typing out:')
             else:
                 print('"' + prefix + '" is not a word, perhaps you were typing out:')
-            library = [prefix + word for word in self.get_library(current, library = [])]
-            for word in library:
-                print(word)
+            library = []
+            for word in self.iter_library(current):
+                print(prefix + word)
+                library.append(prefix + word)
             return library     # list includes empty string if its already a word
         print("I'm not quite sure what you meant by " + '"' + prefix + '"...')
+        suggestions = [word for word, _ in self.fuzzy_search(prefix, 2, 5)]
+        if suggestions:
+            print('Did you mean: ' + ', '.join(suggestions) + '?')
         return []
 
-    def word_hunt(self, matrix):
+    def autocomplete(self, prefix, k=10):
+        """Returns up to k words starting with prefix, most frequently seen first
+
+        Searches best-first using each node's highest word count below it, so only branches that
+        can still hold one of the top k words are opened, however many words share the prefix
+
+        :param prefix: prefix string to complete
+        :type prefix: str
+        :param k: maximum number of words to return, defaults to 10
+        :type k: int, optional
+        :return: list of words, ties broken alphabetically
+        :rtype: list
+        """
+        current = self.search_prefix(prefix)
+        if current is None or k <= 0:
+            return []
+
+        library = []
+        heap = [(-current._best, prefix, 1, id(current), current)]    # stores (-count, word, 0 for word
+        while heap and len(library) < k:                                # or 1 for subtree, tiebreak, node)
+            _, word, subtree, _, node = heappop(heap)
+            if not subtree:
+                library.append(word)
+                continue
+            if node._end:
+                heappush(heap, (-node._count, word, 0, id(node), node))
+            for val, child in node._children.items():
+                heappush(heap, (-child._best, word + val, 1, id(child), child))
+        return library
+
+    def fuzzy_search(self, word, max_edits=2, k=10):
+        """Returns known words within max_edits insertions, deletions or substitutions of word
+
+        Walks the trie carrying one row of the Levenshtein table per node, the distances from the
+        node's prefix to every prefix of word, and skips a subtree once every entry in its row is
+        over the budget. Only entries within budget of the diagonal can be in budget, so just those
+        are computed. Once k words are found the budget shrinks to the k-th best distance
+
+        :param word: word to find close matches of
+        :type word: str
+        :param max_edits: most edits allowed, defaults to 2
+        :type max_edits: int, optional
+        :param k: maximum number of words to return, None for all, defaults to 10
+        :type k: int, optional
+        :return: list of (word, distance), closest first, then most frequently seen, then alphabetically
+        :rtype: list
+        """
+        if k is not None and k <= 0:
+            return []
+        target = self.alphabet.split(word)
+        length = len(target)
+        over = max_edits + 1                # stands in for every distance over max_edits
+        budget = max_edits
+        found = [0] * (max_edits + 1)       # number of words found at each distance
+        results = []                        # stores (distance, -count, word)
+
+        def keep(distance, node, spelled):
+            nonlocal budget
+            results.append((distance, -node._count, spelled))
+            found[distance] += 1
+            if k is not None:
+                total = 0
+                for shorter in range(budget + 1):   # smallest budget still holding k words
+                    total += found[shorter]
+                    if total >= k:
+                        budget = shorter
+                        break
+
+        if self.root._end and length <= budget:
+            keep(length, self.root, '')
+        stack = [(self.root, '', 0, [min(j, over) for j in range(length + 1)])]
+        while stack:
+            node, spelled, depth, previous = stack.pop()
+            depth += 1
+            low = max(1, depth - budget)
+            high = min(length, depth + budget)
+            for val, child in node._children.items():
+                row = [over] * (length + 1)
+                best = row[0] = depth if depth <= budget else over
+                for j in range(low, high + 1):
+                    distance = previous[j - 1] + (target[j - 1] != val)
+                    if row[j - 1] < distance:
+                        distance = row[j - 1] + 1
+                    if previous[j] < distance:
+                        distance = previous[j] + 1
+                    row[j] = distance
+                    if distance < best:
+                        best = distance
+                if child._end and row[length] <= budget:
+                    keep(row[length], child, spelled + val)
+                if best <= budget:
+                    stack.append((child, spelled + val, depth, row))
+
+        results = sorted(result for result in results if result[0] <= budget)[:k]
+        return [(spelled, distance) for distance, _, spelled in results]
+
+    def match(self, pattern, index=None):
+        """Returns known words matching a wildcard pattern
+
+        In pattern, ? stands for any one letter, * for any run of letters including none, [abc] for
+        any one of a, b or c, [a-c] for any letter from a to c and [!abc] for any letter but those.
+        Letters here are the alphabet's tokens, so with a "qu" token ? matches "qu" but q* doesn't.
+        The pattern runs as a set of states over the trie, so a subtree is only opened while some
+        state can still match, and steps where only exact letters can match look them up directly.
+        A pattern starting with * can't rule anything out from the front, so with an index it is
+        matched backwards over the reversed words instead
+
+        :param pattern: pattern to match
+        :type pattern: str
+        :param index: reversed words of this trie, used for patterns starting with *, defaults to None
+        :type index: SuffixIndex, optional
+        :raises ValueError: if a [ is never closed
+        :return: sorted list of words
+        :rtype: list
+        """
+        elements = _parse_pattern(pattern, self.alphabet)
+        if index is not None and elements and elements[0][0] == '*' and elements[-1][0] != '*':
+            backwards = [(kind, value[::-1]) if kind == '=' else (kind, value) for kind, value in reversed(elements)]
+            return sorted(word[::-1] for word in index.trie._match(backwards))
+        return sorted(self._match(elements))
+
+    def _match(self, elements):
+        """Generator of known words matching parsed pattern elements, see match
+        """
+        accept = 1 << len(elements)
+        stars = 0
+        for i, (kind, _) in enumerate(elements):
+            if kind == '*':
+                stars |= 1 << i
+
+        def closure(states):            # a * may match nothing, so it also lets the next element start
+            for i in range(len(elements)):
+                if states & stars & 1 << i:
+                    states |= 1 << i + 1
+            return states
+
+        steps = {}                      # stores {(states, token): states after matching token}
+
+        def step(states, token):
+            key = (states, token)
+            after = steps.get(key)
+            if after is None:
+                after = 0
+                for i, (kind, value) in enumerate(elements):
+                    if not states & 1 << i:
+                        continue
+                    if kind == '*':
+                        after |= 1 << i
+                    elif kind == '?' or (kind == '=' and value == token) or \
+                            (kind == '[' and len(token) == 1 and (token in value[0]) != value[1]):
+                        after |= 1 << i + 1
+                after = steps[key] = closure(after)
+            return after
+
+        literals = {}                   # stores {states: tokens it can match} when every state is exact
+
+        def exact(states):
+            if states not in literals:
+                tokens = set()
+                for i, (kind, value) in enumerate(elements):
+                    if states & 1 << i:
+                        if kind != '=':
+                            tokens = None
+                            break
+                        tokens.add(value)
+                literals[states] = tokens
+            return literals[states]
+
+        start = closure(1)
+        if self.root._end and start & accept:
+            yield ''
+        stack = [(self.root, '', start)]
+        while stack:
+            node, word, states = stack.pop()
+            tokens = exact(states & ~accept)
+            if tokens is None:
+                children = node._children.items()
+            else:
+                children = [(token, node._children[token]) for token in tokens if token in node._children]
+            for val, child in children:
+                after = step(states, val)
+                if not after:
+                    continue
+                if child._end and after & accept:
+                    yield word + val
+                if after != accept and child._children:
+                    stack.append((child, word + val, after))
+
+    def word_hunt(self, matrix, stats=None):
         """Application problem: Uses trie data structure to find all valid words within matrix
 
         :param matrix: matrix to search through
         :type matrix: nested list
+        :param stats: counts the work the search does; the cache is skipped so a search always runs.
+            Without stats the uninstrumented search is used, so counting costs nothing unless asked for
+        :type stats: TrieStats, optional
         :return: list of words found
         :rtype: list
         """
-        moves = [(-1, 1), ( 0, 1), ( 1, 1),                   # Grid of all possible moves around matrix
-                 (-1, 0),          ( 1, 0),
-                 (-1,-1), ( 0,-1), ( 1,-1)]
+        if stats is not None:
+            return self._word_hunt_instrumented(matrix, stats)
+        if self.cache is not None:
+            return self.cache.word_hunt(self, matrix)
+        return self._word_hunt(matrix)
+
+    def _word_hunt(self, matrix):
+        """Does the search for word_hunt without looking at the cache
+        """
+        cells, _, neighbors = compile_board(matrix)
+        found = set()
+        for i, cell in enumerate(cells):                # Search starting at every spot in matrix
+            node = self._follow(self.root, cell)
+            if node:
+                self._word_hunt_recursive(cells, neighbors, i, 1 << i, node, [cell], found)
+        return list(found)
+
+    def _word_hunt_instrumented(self, matrix, stats):
+        """Same search as _word_hunt, counting its work in stats
+        """
+        cells, coordinates, neighbors = compile_board(matrix)
+        found = set()
+        for i, cell in enumerate(cells):
+            start = time.perf_counter()
+            node = self._follow(self.root, cell)
+            if node is None:
+                stats.pruned += 1
+            else:
+                self._word_hunt_recursive_instrumented(cells, neighbors, i, 1 << i, node, [cell], found, stats)
+            stats.cell_seconds[coordinates[i]] = stats.cell_seconds.get(coordinates[i], 0) + time.perf_counter() - start
+        stats.hunts += 1
+        if stats.callback:
+            stats.callback(stats)
+        return list(found)
+
+    def _word_hunt_recursive_instrumented(self, cells, neighbors, i, visited, node, path, found, stats):
+        """Same search as _word_hunt_recursive, counting its work in stats
+        """
+        stats.expanded += 1
+        if len(path) > stats.max_depth:
+            stats.max_depth = len(path)
+        if node._end:
+            stats.hits += 1
+            found.add(''.join(path))
+
+        for j, bit in neighbors[i]:
+            if visited & bit:
+                continue
+            child = self._follow(node, cells[j])
+            if child is None:
+                stats.pruned += 1
+                continue
+            path.append(cells[j])
+            self._word_hunt_recursive_instrumented(cells, neighbors, j, visited | bit, child, path, found, stats)
+            path.pop()
+
+    def iter_word_hunt(self, matrix, paths=False, limit=None, time_budget=None):
+        """Generator yielding each word within matrix once, as soon as the search finds it
+
+        :param matrix: matrix to search through
+        :type matrix: nested list
+        :param paths: yield (word, path) where path is a tuple of (x, y) coordinates, defaults to False
+        :type paths: bool, optional
+        :param limit: stop after this many words, defaults to None (no limit)
+        :type limit: int, optional
+        :param time_budget: stop after this many seconds, defaults to None (no limit)
+        :type time_budget: float, optional
+        :return: generator of words, or of (word, path) pairs
+        :rtype: generator
+        """
+        if limit is not None and limit <= 0:
+            return
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+
+        seen = set()
+        for word, path in self._hunt(matrix, deadline):
+            if word in seen:
+                continue
+            seen.add(word)
+            yield (word, path) if paths else word
+            if len(seen) == limit:
+                return
 
-        results = []
-        for y in range(len(matrix)):
-            for x in range(len(matrix[y])):             # Search starting at every spot in matrix
-                results += self._word_hunt_recursive(matrix, y, x, set([(x, y)]), moves, matrix[y][x])
-        return list(set(results))
+    def word_hunt_paths(self, matrix, all_paths=False, scoring=BOGGLE_SCORES):
+        """Finds all valid words within matrix along with where they are and what they score
+
+        :param matrix: matrix to search through
+        :type matrix: nested list
+        :param all_paths: keep every path spelling each word rather than the first, defaults to False
+        :type all_paths: bool, optional
+        :param scoring: scoring rules passed to score_word, defaults to BOGGLE_SCORES
+        :type scoring: dict or callable, optional
+        :return: {word: (list of paths, score)} where each path is a tuple of (x, y) coordinates
+        :rtype: dict
+        """
+        results = {}
+        for word, path in self._hunt(matrix):
+            if word not in results:
+                results[word] = ([path], score_word(word, scoring))
+            elif all_paths:
+                results[word][0].append(path)
+        return results
 
-    def _word_hunt_recursive(self, matrix, y, x, visited, moves, word):
-        """Recursive function that returns a list of words found in grid using DFS
+    def _hunt(self, matrix, deadline=None):
+        """Iterative DFS over matrix, yields (word, path) for every path spelling a word
 
         :param matrix: matrix to search through
         :type matrix: nested list
-        :param y: y-coordinate of current matrix position
-        :type y: int
-        :param x: x-coordinate of current matrix position
-        :type x: int
-        :param visited: set of coordinates in matrix already visited
-        :type visited: set
-        :param moves: list of possible moves relative from current position
-        :type moves: list
-        :param word: word currently being looked at
+        :param deadline: time.perf_counter() value to stop searching at, defaults to None
+        :type deadline: float, optional
+        :return: generator of (word, tuple of (x, y) coordinates)
+        :rtype: generator
+        """
+        cells, coordinates, neighbors = compile_board(matrix)
+        for i, cell in enumerate(cells):
+            node = self._follow(self.root, cell)
+            if node is None:
+                continue
+            if node._end:
+                yield cell, (coordinates[i],)
+
+            path = [i]
+            letters = [cell]
+            visited = 1 << i
+            stack = [(node, iter(neighbors[i]))]     # stores (node, neighbours left to try) for each cell in path
+            while stack:
+                node, adjacent = stack[-1]
+                for j, bit in adjacent:
+                    if visited & bit:
+                        continue
+                    child = self._follow(node, cells[j])
+                    if child is None:
+                        continue
+                    visited |= bit
+                    path.append(j)
+                    letters.append(cells[j])
+                    stack.append((child, iter(neighbors[j])))
+                    if child._end:
+                        yield ''.join(letters), tuple(coordinates[k] for k in path)
+                    if deadline is not None and time.perf_counter() > deadline:
+                        return
+                    break
+                else:                           # No neighbours left, step back
+                    stack.pop()
+                    visited ^= 1 << path.pop()
+                    letters.pop()
+
+    def _follow(self, node, letters):
+        """Walks down from node one token at a time, returns None if path leaves the trie
+
+        :param node: node to begin walking from
+        :type node: TrieNode
+        :param letters: letters to follow, a matrix cell may hold more than one (e.g. "qu")
+        :type letters: str
+        :return: node reached after following every token of letters, otherwise None
+        :rtype: TrieNode
+        """
+        for letter in self.alphabet.split(letters):
+            node = node._children.get(letter)
+            if node is None:
+                return
+        return node
+
+    def _word_hunt_recursive(self, cells, neighbors, i, visited, node, path, found):
+        """Recursive function that adds words found in grid to found using DFS
+
+        The trie node matching the current path is carried down the search, so each step
+        only looks at the children of one node instead of re-walking from the root
+
+        :param cells: cell values of the board, see compile_board
+        :type cells: list
+        :param neighbors: neighbour table of the board, see compile_board
+        :type neighbors: list
+        :param i: number of current cell
+        :type i: int
+        :param visited: bitmask of cells already visited
+        :type visited: int
+        :param node: node in trie reached by the current path
+        :type node: TrieNode
+        :param path: cell values making up word currently being looked at
+        :type path: list
+        :param found: set of words found so far
+        :type found: set
+        """
+        if node._end:                               # If word is found, add to found but keep going!
+            found.add(''.join(path))
+
+        children = node._children
+        for j, bit in neighbors[i]:
+            if visited & bit:
+                continue
+            cell = cells[j]
+            child = children.get(cell)              # a cell holding one token is a single lookup
+            if child is None and len(cell) > 1:
+                child = self._follow(node, cell)
+            if child is None:                       # If prefix doesn't exist in trie, sieze operations
+                continue
+            path.append(cell)
+            self._word_hunt_recursive(cells, neighbors, j, visited | bit, child, path, found)
+            path.pop()
+
+
+
+class ConcurrentTrie:
+
+    def __init__(self, trie=None):
+        """Initialization of a trie that many threads can read while others write to it
+
+        Readers use the published snapshot, a Trie that is never modified, so they don't lock.
+        Writers take a lock, copy the nodes along the path of the word they change, apply the
+        change to the copy and publish it as the new snapshot
+
+        :param trie: words to start with, must not be modified afterwards, defaults to an empty trie
+        :type trie: Trie, optional
+        """
+        self._lock = threading.Lock()
+        self._trie = trie if trie is not None else Trie()
+        self.version = 0            # number of snapshots published
+
+    def __repr__(self):
+        """Returns string representation of trie; for use in debugging
+        """
+        return repr(self._trie)
+
+    def snapshot(self):
+        """Returns the current version of the trie; read it freely, but never modify it
+        """
+        return self._trie
+
+    @property
+    def size(self):
+        """Number of words in the current snapshot
+        """
+        return self._trie.size
+
+    def search_word(self, word):
+        """Searches current snapshot to find param word
+        """
+        return self._trie.search_word(word)
+
+    def search_prefix(self, prefix):
+        """Searches current snapshot to find prefix, see Trie.search_prefix
+        """
+        return self._trie.search_prefix(prefix)
+
+    def autocomplete(self, prefix, k=10):
+        """Returns up to k words starting with prefix from current snapshot, see Trie.autocomplete
+        """
+        return self._trie.autocomplete(prefix, k)
+
+    def count_prefix(self, prefix):
+        """Returns number of words starting with prefix in current snapshot, see Trie.count_prefix
+        """
+        return self._trie.count_prefix(prefix)
+
+    def rank(self, word):
+        """Returns position of word in current snapshot, see Trie.rank
+        """
+        return self._trie.rank(word)
+
+    def select(self, k, prefix=''):
+        """Returns word at position k of current snapshot, see Trie.select
+        """
+        return self._trie.select(k, prefix)
+
+    def fuzzy_search(self, word, max_edits=2, k=10):
+        """Returns close matches of word from current snapshot, see Trie.fuzzy_search
+        """
+        return self._trie.fuzzy_search(word, max_edits, k)
+
+    def word_hunt(self, matrix):
+        """Finds all valid words within matrix using current snapshot, see Trie.word_hunt
+        """
+        return self._trie.word_hunt(matrix)
+
+    def insert_word(self, word):
+        """Publishes a new snapshot with word inserted; returns None
+        """
+        with self._lock:
+            trie = self._copy_paths([word])
+            trie.insert_word(word)
+            self._publish(trie)
+
+    def remove_word(self, word):
+        """Publishes a new snapshot with word removed; returns whether word was found
+        """
+        with self._lock:
+            trie = self._copy_paths([word])
+            found = trie.remove_word(word, trie.root)
+            self._publish(trie)
+            return found
+
+    def insert_many(self, words):
+        """Publishes one new snapshot with every word in words inserted; returns None
+        """
+        words = list(words)
+        with self._lock:
+            trie = self._copy_paths(words)
+            trie.insert_many(words)
+            self._publish(trie)
+
+    def remove_many(self, words):
+        """Publishes one new snapshot with every word in words removed; returns number of words removed
+        """
+        words = list(words)
+        with self._lock:
+            trie = self._copy_paths(words)
+            removed = trie.remove_many(words)
+            self._publish(trie)
+            return removed
+
+    def contains_many(self, words):
+        """Searches current snapshot for every word in words, see Trie.contains_many
+        """
+        return self._trie.contains_many(words)
+
+    def _copy_paths(self, words):
+        """Returns a new Trie sharing every node of the current snapshot except those along words,
+        which are copied so the new Trie can be modified without readers seeing it
+
+        :param words: words whose paths will be modified
+        :type words: iterable
+        :rtype: Trie
+        """
+        old = self._trie
+        trie = Trie(old.alphabet)
+        trie.size = old.size
+        trie.version = old.version
+        trie.root = self._copy_node(old.root)
+        copied = set([id(trie.root)])
+        for word in words:
+            current = trie.root
+            for letter in old.alphabet.split(word):
+                child = current._children.get(letter)
+                if child is None:
+                    break
+                if id(child) not in copied:         # words sharing a prefix only copy it once
+                    child = current._children[letter] = self._copy_node(child)
+                    copied.add(id(child))
+                current = child
+        return trie
+
+    def _publish(self, trie):
+        """Makes trie the snapshot new readers see; returns None
+        """
+        self._trie = trie
+        self.version += 1
+
+    def _copy_node(self, node):
+        """Returns a copy of node sharing its children
+        """
+        copy = TrieNode(node._val, node._end)
+        if node._children:
+            copy._children = dict(node._children)
+        copy._count = node._count
+        copy._best = node._best
+        copy._words = node._words
+        return copy
+
+
+
+class CompactTrie:
+
+    def __init__(self, labels, first, ends, edge_labels, edge_targets, root, size, alphabet=None):
+        """Initialization of an immutable, array-backed trie; use from_trie or from_words to build one
+
+        Node i owns edges first[i] up to first[i + 1]; each edge stores the index of its label in
+        labels and the index of the node it points to. Edges of a node are sorted by label index.
+        Nodes with identical subtrees are stored once, so shared suffixes are merged (DAWG)
+
+        :param labels: sorted list of distinct edge values
+        :type labels: list
+        :param first: offset of each node's first edge, with one extra trailing offset
+        :type first: array
+        :param ends: end-of-word flag for each node
+        :type ends: bytes
+        :param edge_labels: label index of each edge
+        :type edge_labels: array
+        :param edge_targets: node index each edge points to
+        :type edge_targets: array
+        :param root: index of the root node
+        :type root: int
+        :param size: number of words stored
+        :type size: int
+        :param alphabet: how words are split into edges, defaults to DEFAULT_ALPHABET
+        :type alphabet: Alphabet, optional
+        """
+        self.alphabet = alphabet or DEFAULT_ALPHABET
+        self._labels = labels
+        self._label_ids = {label: i for i, label in enumerate(labels)}
+        self._first = first
+        self._ends = ends
+        self._edge_labels = edge_labels
+        self._edge_targets = edge_targets
+        self.root = root
+        self.size = size
+
+    @classmethod
+    def from_trie(cls, trie):
+        """Builds compact trie holding the same words as trie
+
+        :param trie: trie to compact
+        :type trie: Trie
+        :rtype: CompactTrie
+        """
+        labels = set()
+        stack = [trie.root]
+        while stack:
+            node = stack.pop()
+            labels.update(node._children)
+            stack.extend(node._children.values())
+        labels = sorted(labels)
+        label_ids = {label: i for i, label in enumerate(labels)}
+
+        register = {}           # stores distinct nodes in pairs of {(end, edges): index}
+        indexes = {}            # stores id(TrieNode) -> index of its compact node
+        stack = [(trie.root, False)]
+        while stack:            # Post-order traversal so children are registered before parents
+            node, expanded = stack.pop()
+            if not expanded:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node._children.values())
+                continue
+            edges = tuple(sorted((label_ids[val], indexes[id(child)]) for val, child in node._children.items()))
+            signature = (node._end, edges)
+            index = register.get(signature)
+            if index is None:
+                index = register[signature] = len(register)
+            indexes[id(node)] = index
+
+        first = array('I')
+        edge_labels = array('I')
+        edge_targets = array('I')
+        ends = bytearray(len(register))
+        for (end, edges), index in register.items():     # dicts keep insertion order, i.e. index order
+            first.append(len(edge_labels))
+            ends[index] = end
+            for label, target in edges:
+                edge_labels.append(label)
+                edge_targets.append(target)
+        first.append(len(edge_labels))
+
+        return cls(labels, first, bytes(ends), edge_labels, edge_targets, indexes[id(trie.root)], trie.size,
+                   trie.alphabet)
+
+    @classmethod
+    def from_words(cls, words, alphabet=None):
+        """Builds compact trie from an iterable of words
+
+        :param words: words to store
+        :type words: iterable
+        :param alphabet: how words are split into edges, defaults to DEFAULT_ALPHABET
+        :type alphabet: Alphabet, optional
+        :rtype: CompactTrie
+        """
+        trie = Trie(alphabet)
+        for word in words:
+            trie.insert_word(word)
+        return cls.from_trie(trie)
+
+    @classmethod
+    def from_sorted(cls, words):
+        """Builds compact trie from words in sorted order without building a Trie first
+
+        Each node is registered as soon as no later word can reach it, so only the nodes along the
+        latest word are ever held unmerged and memory stays close to the size of the result
+
+        :param words: iterable of words in sorted order, duplicates are skipped
+        :type words: iterable
+        :raises ValueError: if words are not sorted
+        :rtype: CompactTrie
+        """
+        register = {}           # stores distinct nodes in pairs of {(end, edges): index}
+        path = [[False, []]]    # unregistered nodes along the latest word as [end, [(letter, child)]]
+        previous = None
+        size = 0
+
+        def register_below(depth):
+            # registers the nodes deeper than depth, each child before its parent
+            while len(path) > depth + 1:
+                end, edges = path.pop()
+                signature = (end, tuple(edges))
+                index = register.get(signature)
+                if index is None:
+                    index = register[signature] = len(register)
+                parent_edges = path[-1][1]
+                parent_edges[-1] = (parent_edges[-1][0], index)
+
+        for word in words:
+            if previous is not None and word <= previous:
+                if word == previous:
+                    continue
+                raise ValueError('words must be sorted, ' + repr(word) + ' follows ' + repr(previous))
+            shared = 0 if previous is None else _shared_length(word, previous)
+            register_below(shared)
+            for letter in word[shared:]:
+                path[-1][1].append((letter, None))
+                path.append([False, []])
+            path[-1][0] = True
+            previous = word
+            size += 1
+        register_below(0)
+
+        end, edges = path[0]
+        labels = sorted(set(letter for (_, node_edges) in register for letter, _ in node_edges) |
+                        set(letter for letter, _ in edges))
+        label_ids = {label: i for i, label in enumerate(labels)}
+        root = register.setdefault((end, tuple(edges)), len(register))
+
+        first = array('I')
+        edge_labels = array('I')
+        edge_targets = array('I')
+        ends = bytearray(len(register))
+        for (end, edges), index in register.items():     # dicts keep insertion order, i.e. index order
+            first.append(len(edge_labels))
+            ends[index] = end
+            for letter, target in edges:            # sorted input adds edges in label order
+                edge_labels.append(label_ids[letter])
+                edge_targets.append(target)
+        first.append(len(edge_labels))
+
+        return cls(labels, first, bytes(ends), edge_labels, edge_targets, root, size)
+
+    def __repr__(self):
+        """Returns string representation of trie; for use in debugging
+        """
+        return '\nSize: ' + str(self.size) + '\nLibrary: ' + str(self.get_library())
+
+    def save(self, file_name):
+        """Writes trie to a versioned binary file that load can map in place; returns None
+
+        Layout is a little-endian FILE_HEADER, the NUL separated labels padded to 4 bytes, then the
+        first, edge_labels and edge_targets arrays as unsigned 32-bit ints and finally the end flags
+
+        :param file_name: file to write
+        :type file_name: str
+        """
+        labels = '\0'.join(self._labels).encode('utf-8')
+        labels += b'\0' * (-len(labels) % 4)
+        arrays = [array('I', self._first), array('I', self._edge_labels), array('I', self._edge_targets)]
+        if sys.byteorder != 'little':
+            for values in arrays:
+                values.byteswap()
+
+        with open(file_name, 'wb') as writer:
+            writer.write(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, self.alphabet.flags(), len(labels), len(self._ends),
+                                          len(self._edge_labels), self.root, self.size))
+            writer.write(labels)
+            for values in arrays:
+                writer.write(values.tobytes())
+            writer.write(bytes(self._ends))
+
+    @classmethod
+    def load(cls, file_name):
+        """Maps a file written by save into memory; queries read the arrays in place, so processes
+        loading the same file share its page cache instead of each holding a copy
+
+        :param file_name: file to read
+        :type file_name: str
+        :raises ValueError: if file is not a trie file of this version, or is truncated or corrupt
+        :rtype: CompactTrie
+        """
+        with open(file_name, 'rb') as reader:
+            buffer = mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(buffer) < FILE_HEADER.size:
+            raise ValueError(file_name + ' is not a trie file')
+        magic, version, flags, label_bytes, nodes, edges, root, size = FILE_HEADER.unpack_from(buffer)
+        if magic != FILE_MAGIC:
+            raise ValueError(file_name + ' is not a trie file')
+        if version != FILE_VERSION:
+            raise ValueError(file_name + ' has unsupported trie file version ' + str(version))
+        expected = FILE_HEADER.size + label_bytes + 4 * (nodes + 1 + 2 * edges) + nodes
+        if len(buffer) != expected:
+            raise ValueError('%s is %d bytes, its header describes %d; truncated or corrupt' %
+                             (file_name, len(buffer), expected))
+        if root >= nodes:
+            raise ValueError(file_name + ' has root ' + str(root) + ' outside its ' + str(nodes) + ' nodes')
+
+        view = memoryview(buffer)
+        offset = FILE_HEADER.size
+        labels = bytes(view[offset:offset + label_bytes]).rstrip(b'\0').decode('utf-8')
+        offset += label_bytes
+        arrays = []
+        for count in (nodes + 1, edges, edges):
+            values = view[offset:offset + 4 * count].cast('I')
+            if sys.byteorder != 'little':       # Big-endian machines pay for a swapped copy
+                values = array('I', values)
+                values.byteswap()
+            arrays.append(values)
+            offset += 4 * count
+        ends = view[offset:offset + nodes]
+
+        labels = labels.split('\0') if labels else []
+        trie = cls(labels, arrays[0], ends, arrays[1], arrays[2], root, size, Alphabet.from_labels(labels, flags))
+        trie._buffer = buffer       # keep the mapping alive for as long as the trie is
+        return trie
+
+    def is_empty(self):
+        """Returns whether or not trie is empty
+        """
+        return self.size == 0
+
+    def node_count(self):
+        """Returns number of nodes stored after merging shared suffixes
+        """
+        return len(self._ends)
+
+    def get_child(self, node, val):
+        """Returns index of child node with given value, returns None if doesn't exist
+
+        :param node: index of parent node
+        :type node: int
+        :param val: value of child to return
+        :type val: str
+        """
+        label = self._label_ids.get(val)
+        if label is None:
+            return
+        low = self._first[node]
+        high = self._first[node + 1]
+        i = bisect_left(self._edge_labels, label, low, high)
+        if i < high and self._edge_labels[i] == label:
+            return self._edge_targets[i]
+
+    def _follow(self, node, letters):
+        """Walks down from node one token at a time, returns None if path leaves the trie
+        """
+        label_ids = self._label_ids
+        first = self._first
+        edge_labels = self._edge_labels
+        for letter in self.alphabet.split(letters):
+            label = label_ids.get(letter)
+            if label is None:
+                return
+            high = first[node + 1]
+            i = bisect_left(edge_labels, label, first[node], high)
+            if i == high or edge_labels[i] != label:
+                return
+            node = self._edge_targets[i]
+        return node
+
+    def search_word(self, word):
+        """Searches trie to find param word
+
+        :param word: word to search for
         :type word: str
+        """
+        node = self._follow(self.root, word)
+        return node is not None and bool(self._ends[node])
+
+    def search_prefix(self, prefix):
+        """Searches trie to find prefix
+
+        :param prefix: prefix to search for
+        :type prefix: str
+        :return: index of prefix's end node if found, otherwise None (note the root may be index 0)
+        :rtype: int
+        """
+        return self._follow(self.root, prefix)
+
+    def get_library(self, node=None):
+        """Traverses trie and returns list of known words below node
+
+        :param node: index of node to begin searching words from, defaults to root
+        :type node: int, optional
+        :return: list of known words
+        :rtype: list
+        """
+        if node is None:
+            node = self.root
+        library = []
+        stack = [(node, '')]
+        while stack:
+            node, word = stack.pop()
+            if self._ends[node]:
+                library.append(word)
+            for i in range(self._first[node + 1] - 1, self._first[node] - 1, -1):
+                stack.append((self._edge_targets[i], word + self._labels[self._edge_labels[i]]))
+        return library
+
+    def guess_word(self, prefix):
+        """Returns a list of all words that word could extend into
+
+        :param prefix: prefix string to perform guess on
+        :type prefix: str
+        """
+        prefix = self.alphabet.normalize(prefix)
+        current = self.search_prefix(prefix)
+        if current is not None:
+            print("You typed: " + '"' + prefix + '"')
+            if self._ends[current]:
+                print('"' + prefix + '" is a word, but you could have also been typing out:')
+            else:
+                print('"' + prefix + '" is not a word, perhaps you were typing out:')
+            library = [prefix + word for word in self.get_library(current)]
+            for word in library:
+                print(word)
+            return library     # list includes empty string if its already a word
+        print("I'm not quite sure what you meant by " + '"' + prefix + '"...')
+        return []
+
+    def word_hunt(self, matrix):
+        """Application problem: finds all valid words within matrix, same results as Trie.word_hunt
+
+        :param matrix: matrix to search through
+        :type matrix: nested list
         :return: list of words found
         :rtype: list
         """
-        found = []
-        if not self.search_prefix(word):            # If prefix doesn't exist in trie, sieze operations
-            return found
-        if self.search_word(word):                  # If word is found, add to found list but keep going!
-            found.append(word)
+        cells, _, neighbors = compile_board(matrix)
+        found = set()
+        for i, cell in enumerate(cells):
+            node = self._follow(self.root, cell)
+            if node is not None:
+                self._word_hunt_recursive(cells, neighbors, i, 1 << i, node, [cell], found)
+        return list(found)
 
-        for dx, dy in moves:
-            new_x = x + dx
-            new_y = y + dy
-            if new_x >= 0 and new_y >= 0 and new_y < len(matrix) and new_x < len(matrix[y]) and (new_x, new_y) not in visited:
-                visited.add((new_x, new_y))
-                found.extend(self._word_hunt_recursive(matrix, new_y, new_x, visited, moves, word + matrix[new_y][new_x]))
-                visited.remove((new_x, new_y))
-        return list(set(found))                     # Set to list to remove duplicates
+    def _word_hunt_recursive(self, cells, neighbors, i, visited, node, path, found):
+        """Recursive DFS over a compiled board carrying the index of the current node, see Trie._word_hunt_recursive
+        """
+        if self._ends[node]:
+            found.add(''.join(path))
 
-        
+        for j, bit in neighbors[i]:
+            if visited & bit:
+                continue
+            child = self._follow(node, cells[j])
+            if child is None:
+                continue
+            path.append(cells[j])
+            self._word_hunt_recursive(cells, neighbors, j, visited | bit, child, path, found)
+            path.pop()
+
+
+
+class BoardIndex:
+
+    def __init__(self, trie):
+        """Precomputes which words need which letters and letter pairs, so a board can rule out
+        words it cannot hold without searching. Rebuild the index after changing trie
+
+        This is a cheap upper bound on a board's words, not a way to speed up word_hunt: ruling
+        words out costs more than the search it would save, since the search already stops at
+        the first missing prefix
+
+        Each key maps to a bitmap (an int) of word positions: (letter, n) keys mark words using
+        letter at least n times, two-letter string keys mark words with those letters side by side
+
+        :param trie: trie to index
+        :type trie: Trie
+        """
+        self._alphabet = trie.alphabet
+        self._words = sorted(trie.get_library(trie.root, library = []))
+        postings = {}
+        for i, word in enumerate(self._words):
+            for letter, count in Counter(word).items():
+                for n in range(1, count + 1):
+                    postings.setdefault((letter, n), []).append(i)
+            for bigram in set(word[j:j + 2] for j in range(len(word) - 1)):
+                postings.setdefault(bigram, []).append(i)
+
+        self._bitmaps = {}
+        for key, positions in postings.items():
+            bits = bytearray(len(self._words) // 8 + 1)
+            for i in positions:
+                bits[i >> 3] |= 1 << (i & 7)
+            self._bitmaps[key] = int.from_bytes(bits, 'little')
+
+    def candidates(self, matrix):
+        """Returns sorted list of words whose letter counts and adjacent letter pairs fit in matrix
+
+        :param matrix: matrix to search through
+        :type matrix: nested list
+        :rtype: list
+        """
+        cells, _, neighbors = compile_board(matrix)
+        counts = Counter()
+        bigrams = set()
+        for i, cell in enumerate(cells):
+            counts.update(cell)
+            bigrams.update(cell[j:j + 2] for j in range(len(cell) - 1))
+            for j, _ in neighbors[i]:
+                if cell and cells[j]:
+                    bigrams.add(cell[-1] + cells[j][0])
+
+        ruled_out = 0
+        for key, bits in self._bitmaps.items():
+            if type(key) is tuple:
+                if counts[key[0]] < key[1]:
+                    ruled_out |= bits
+            elif key not in bigrams and counts[key[0]] and counts[key[1]]:     # else ruled out by letter
+                ruled_out |= bits
+
+        words = []
+        survivors = ((1 << len(self._words)) - 1) & ~ruled_out
+        for i, byte in enumerate(survivors.to_bytes(len(self._words) // 8 + 1, 'little')):
+            if byte:
+                for j in range(8):
+                    if byte >> j & 1:
+                        words.append(self._words[8 * i + j])
+        return words
+
+    def prune(self, matrix):
+        """Returns trie holding only the candidates for matrix, for checking them against the board;
+        searching it finds the same words as searching the whole trie
+
+        :param matrix: matrix to search through
+        :type matrix: nested list
+        :rtype: Trie
+        """
+        trie = Trie(self._alphabet)
+        trie._insert_sorted(self.candidates(matrix))
+        return trie
+
+
+
+class SuffixIndex:
+
+    def __init__(self, trie):
+        """Trie of every word of trie spelled backwards, so Trie.match can match patterns that start
+        with * from their end. Rebuild the index after changing trie
+
+        :param trie: trie to index
+        :type trie: Trie
+        """
+        alphabet = trie.alphabet
+        self.trie = Trie(Alphabet([token[::-1] for token in alphabet.tokens], alphabet.casefold, alphabet.fold_accents))
+        self.trie.insert_many(word[::-1] for word in trie.iter_library())
+
+
+
+class TrieStats:
+
+    def __init__(self, callback=None):
+        """Initialization of counters filled in by Trie.word_hunt(stats=...) and Trie.instrument
+
+        :param callback: called with this object after each instrumented word_hunt, e.g. to report
+            the counts to a metrics system, defaults to None
+        :type callback: callable, optional
+        """
+        self.callback = callback
+        self.hunts = 0              # instrumented word_hunt calls
+        self.expanded = 0           # board paths the search stepped into
+        self.pruned = 0             # moves dropped because the path left the trie
+        self.hits = 0               # paths spelling a word, including repeats of a word
+        self.max_depth = 0          # most cells in any path explored
+        self.cell_seconds = {}      # stores {(x, y): seconds spent searching from that start cell}
+        self.word_searches = 0      # search_word calls while instrumented
+        self.words_found = 0        # of which found the word
+        self.prefix_searches = 0    # search_prefix calls while instrumented
+        self.prefixes_missed = 0    # of which returned None
+
+    def __repr__(self):
+        """Returns string representation of counters for debugging
+        """
+        return '\n~TrieStats ' + str(self.as_dict()) + '~'
+
+    def as_dict(self):
+        """Returns counters as a dict, with cell_seconds keyed by "x,y" strings so it can be sent as JSON
+        """
+        counts = dict(vars(self))
+        del counts['callback']
+        counts['cell_seconds'] = {str(x) + ',' + str(y): seconds for (x, y), seconds in self.cell_seconds.items()}
+        return counts
+
+
+
+class BoardCache:
+
+    def __init__(self, maxsize=1024, max_bytes=None):
+        """Initialization of a least recently used cache of word_hunt results; set as a Trie's cache
+
+        Boards are keyed by canonical_board, so rotated and mirrored boards share an entry. The
+        cache empties itself when it sees a trie whose version differs from the one it holds
+
+        :param maxsize: most boards to keep, defaults to 1024
+        :type maxsize: int, optional
+        :param max_bytes: most bytes to keep, roughly estimated with sys.getsizeof, defaults to None (no limit)
+        :type max_bytes: int, optional
+        """
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()       # stores {key: (words, bytes)}, least recently used first
+        self._version = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __repr__(self):
+        """Returns string representation of cache statistics for debugging
+        """
+        return '\n~BoardCache ' + str(self.stats()) + '~'
+
+    def __len__(self):
+        """Returns number of boards cached
+        """
+        return len(self._entries)
+
+    def stats(self):
+        """Returns dict of hit, miss, eviction and invalidation counts and current size
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'invalidations': self.invalidations, 'entries': len(self._entries), 'bytes': self.bytes}
+
+    def clear(self):
+        """Removes every board from cache; returns None
+        """
+        self._entries.clear()
+        self.bytes = 0
+
+    def word_hunt(self, trie, matrix):
+        """Returns cached word_hunt result for matrix, solving and caching it on a miss
+
+        :param trie: trie to search with
+        :type trie: Trie
+        :param matrix: matrix to search through
+        :type matrix: nested list
+        :return: list of words found
+        :rtype: list
+        """
+        if trie.version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self.clear()
+            self._version = trie.version
 
+        key = canonical_board(matrix)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return list(entry[0])
 
+        self.misses += 1
+        words = trie._word_hunt(matrix)
+        size = sys.getsizeof(key) + sum(map(sys.getsizeof, key)) + sum(map(sys.getsizeof, words))
+        self._entries[key] = (tuple(words), size)
+        self.bytes += size
+        while self._entries and (len(self._entries) > self.maxsize or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+            self.bytes -= self._entries.popitem(last=False)[1][1]
+            self.evictions += 1
+        return words